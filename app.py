@@ -1,23 +1,75 @@
 import streamlit as st
 from PIL import Image
-import requests
-from io import BytesIO
 import json
 import numpy as np
 from model import CatDogClassifier
+from image_fetch import fetch_images
+from prediction_cache import PredictionCache, image_key, url_key, predict_many_cached
+from metrics import METRICS
 from constants import *
 import os
-
-
-
-
-def load_image_from_url(url):
-    try:
-        response = requests.get(url)
-        image = Image.open(BytesIO(response.content))
-        return image
-    except:
-        return None
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+
+
+
+def load_classifier():
+    if USE_CASCADE:
+        from cascade import load_cascade
+        classifier = load_cascade(MODEL_PATH, backend=INFERENCE_BACKEND, execution_mode=EXECUTION_MODE)
+        classifier.warm_up()
+        return classifier
+    classifier = CatDogClassifier()
+    classifier.load_model(MODEL_PATH, backend=INFERENCE_BACKEND, fallback=False)
+    if INFERENCE_BACKEND == 'keras':
+        classifier.set_execution_mode(EXECUTION_MODE)
+    classifier.warm_up()
+    return classifier
+
+@st.cache_resource
+def start_classifier_loading():
+    """Load and warm the model once per process in the background so the page renders first"""
+    return ThreadPoolExecutor(max_workers=1).submit(load_classifier)
+
+def classifier_loading():
+    """The background load, restarted if the last one failed (e.g. the model file was mid-copy)"""
+    future = start_classifier_loading()
+    if future.done() and future.exception() is not None:
+        # cache_resource would otherwise keep the failed future for the life of the process
+        start_classifier_loading.clear()
+        future = start_classifier_loading()
+    return future
+
+def classifier_ready():
+    """True once the background load has finished successfully"""
+    future = classifier_loading()
+    return future.done() and future.exception() is None
+
+def require_model():
+    """Stop the page with an error unless the trained model file is present"""
+    model_file = TFLITE_PATHS.get(INFERENCE_BACKEND, MODEL_PATH)
+    if not os.path.exists(model_file):
+        st.error(f"Model not found! Please ensure {model_file} is in the repository.")
+        st.stop()
+
+def get_classifier():
+    """Shared warm classifier, waiting for the background load if it is still running"""
+    return classifier_loading().result()
+
+@st.cache_resource
+def get_prediction_cache():
+    """Process-wide prediction cache, invalidated when the model file changes"""
+    if USE_CASCADE:
+        # Keyed on both models and the threshold, so retraining either one or recalibrating invalidates it
+        cascade = get_classifier()
+        return PredictionCache(cascade.model_paths, salt=f"cascade threshold {cascade.threshold}")
+    return PredictionCache(TFLITE_PATHS.get(INFERENCE_BACKEND, MODEL_PATH))
+
+@st.cache_data(ttl=600, max_entries=64, show_spinner=False)
+def load_images_from_urls(urls):
+    """Fetch several URLs concurrently with timeouts and size limits; reruns reuse the result"""
+    return fetch_images(list(urls))
 
 # Enhanced UI/UX styling
 st.markdown("""
@@ -75,15 +127,19 @@ else:
 
 
 
+# Start loading TensorFlow and the model while the user picks an image
+if os.path.exists(TFLITE_PATHS.get(INFERENCE_BACKEND, MODEL_PATH)):
+    classifier_loading()
+
 # Enhanced input method selection
 st.markdown("<h3 style='text-align: center; margin-bottom: 20px;'>Choose Input Method</h3>", unsafe_allow_html=True)
 
 # Center the radio buttons
 col1, col2, col3 = st.columns([1, 2, 1])
 with col2:
-    input_method = st.radio("", ["📁 Upload File", "🔗 Image URL"], horizontal=True)
+    input_method = st.radio("", ["📁 Upload File", "🔗 Image URL", "🎬 Upload Video"], horizontal=True)
 
-image = None
+images = []
 
 col1, col2, col3 = st.columns([1, 2, 1])
 
@@ -91,57 +147,101 @@ with col2:
     if input_method == "📁 Upload File":
         uploaded_file = st.file_uploader("Choose an image", type=['jpg', 'jpeg', 'png'])
         if uploaded_file:
-            image = Image.open(uploaded_file)
+            images.append(("Input Image", Image.open(uploaded_file), image_key(uploaded_file.getvalue())))
+            
+    elif input_method == "🎬 Upload Video":
+        uploaded_video = st.file_uploader("Choose a video", type=['mp4', 'mov', 'avi', 'mkv', 'webm'])
+        if uploaded_video:
+            st.video(uploaded_video)
+            if st.button("🔍 Classify Video", type="primary"):
+                with st.spinner("Analyzing video..."):
+                    try:
+                        require_model()
+                        from video import classify_video
+                        # OpenCV reads from a path, so spool the upload to a temporary file
+                        suffix = os.path.splitext(uploaded_video.name)[1]
+                        with tempfile.NamedTemporaryFile(suffix=suffix) as f:
+                            f.write(uploaded_video.getvalue())
+                            f.flush()
+                            result = classify_video(get_classifier(), f.name)
+                        
+                        st.success(f"**{result['label'].upper()}** ({result['confidence']:.1%} confidence)")
+                        st.caption(f"{result['frames_sampled']} frames sampled, {result['frames_classified']} "
+                                   f"classified in {result['seconds']:.1f}s ({result['sampled_fps']:.1f} fps)")
+                        st.subheader("Segments")
+                        st.dataframe([
+                            {'from (s)': s['start_s'], 'to (s)': s['end_s'], 'label': s['label'],
+                             'confidence': f"{s['confidence']:.1%}", 'frames': s['frames']}
+                            for s in result['segments']
+                        ])
+                    except Exception as e:
+                        st.error(f"Error during video prediction: {str(e)}")
             
     else:  # Image URL
-        url = st.text_input("Enter image URL:")
-        if url:
-            image = load_image_from_url(url)
-            if image is None:
-                st.error("Failed to load image from URL")
-
-    if image:
-        st.image(image, caption="Input Image", width=400)
+        url_text = st.text_area("Enter image URL(s), one per line:")
+        urls = [line.strip() for line in url_text.splitlines() if line.strip()]
+        if urls:
+            for result in load_images_from_urls(tuple(urls)):
+                if result.image is None:
+                    st.error(f"Failed to load image from URL: {result.url} ({result.error})")
+                else:
+                    key = url_key(result.url, result.validator) if result.validator else image_key(result.data)
+                    images.append((result.url, result.image, key))
+
+    if images:
+        for caption, image, _ in images:
+            st.image(image, caption=caption, width=400)
         
         # Load and predict with model
-        if st.button("🔍 Classify Image", type="primary"):
+        if st.button("🔍 Classify Image" if len(images) == 1 else f"🔍 Classify {len(images)} Images", type="primary"):
             with st.spinner("Analyzing image..."):
                 try:
-                    # Initialize classifier
-                    classifier = CatDogClassifier()
-                    
-                    # Load and use real trained model only
-                    if not os.path.exists(MODEL_PATH):
-                        st.error("Model not found! Please ensure cat_dog_model.h5 is in the repository.")
-                        st.stop()
+                    # Use real trained model only
+                    require_model()
                     
-                    classifier.load_model(MODEL_PATH)
-                    predicted_class, confidence = classifier.predict(image)
+                    # Shared warm classifier, one forward pass for every uncached image
+                    classifier = get_classifier()
+                    results = predict_many_cached(
+                        classifier,
+                        get_prediction_cache(),
+                        [image for _, image, _ in images],
+                        [key for _, _, key in images]
+                    )
                     st.success("🤖 Using trained model")
                     
-                    # Display results
-                    col1, col2, col3 = st.columns(3)
-                    
-                    with col2:
-                        if confidence >= HIGH_CONFIDENCE:
-                            st.success(f"**{predicted_class.upper()}** ({confidence:.1%} confidence)")
-                        elif confidence >= MEDIUM_CONFIDENCE:
-                            st.warning(f"**{predicted_class.upper()}** ({confidence:.1%} confidence)")
-                        else:
-                            st.info(f"**{predicted_class.upper()}** ({confidence:.1%} confidence - Low)")
-                    
-                    # Show confidence breakdown
-                    st.subheader("Prediction Confidence")
-                    
-                    # Get real model predictions
-                    image_processed = image.convert('RGB').resize(IMG_SIZE)
-                    image_array = np.array(image_processed) / 255.0
-                    image_array = np.expand_dims(image_array, axis=0)
-                    predictions = classifier.model.predict(image_array)[0]
-                    
-                    for i, class_name in enumerate(CLASS_NAMES):
-                        confidence_val = float(predictions[i])
-                        st.progress(confidence_val, text=f"{class_name.capitalize()}: {confidence_val:.1%}")
+                    for (caption, _, _), (predicted_class, confidence, predictions) in zip(images, results):
+                        if len(images) > 1:
+                            st.markdown(f"**{caption}**")
+                        
+                        # Display results
+                        col1, col2, col3 = st.columns(3)
+                        
+                        with col2:
+                            if confidence >= HIGH_CONFIDENCE:
+                                st.success(f"**{predicted_class.upper()}** ({confidence:.1%} confidence)")
+                            elif confidence >= MEDIUM_CONFIDENCE:
+                                st.warning(f"**{predicted_class.upper()}** ({confidence:.1%} confidence)")
+                            else:
+                                st.info(f"**{predicted_class.upper()}** ({confidence:.1%} confidence - Low)")
+                        
+                        # Show confidence breakdown
+                        st.subheader("Prediction Confidence")
+                        
+                        for i, class_name in enumerate(CLASS_NAMES):
+                            confidence_val = float(predictions[i])
+                            st.progress(confidence_val, text=f"{class_name.capitalize()}: {confidence_val:.1%}")
                         
                 except Exception as e:
-                    st.error(f"Error during prediction: {str(e)}")
\ No newline at end of file
+                    st.error(f"Error during prediction: {str(e)}")
+
+# The cascade's cache key needs the loaded models, so wait for them rather than block the page
+if not USE_CASCADE or classifier_ready():
+    with st.sidebar.expander("Prediction cache"):
+        st.json(get_prediction_cache().stats())
+
+with st.sidebar.expander("Stage latency"):
+    st.json(METRICS.summary())
+
+if USE_CASCADE and classifier_ready():
+    with st.sidebar.expander("Cascade"):
+        st.json(get_classifier().stats())
@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from constants import *
+
+def load_tuning(path=TUNING_PATH):
+    """Saved tuning result, or an empty dict when no tuning has been run"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get('best', {})
+
+def tuned_batch_size(path=TUNING_PATH):
+    """Batch size chosen by the last tuning run, or BATCH_SIZE"""
+    return load_tuning(path).get('batch_size', BATCH_SIZE)
+
+def apply_tuning(classifier, path=TUNING_PATH):
+    """Initialise TF with the tuned thread pools and return the tuned batch size.
+
+    Call before the model is created so the thread settings take effect.
+    """
+    from model import init_tensorflow
+
+    tuning = load_tuning(path)
+    if tuning:
+        print(f"⚙️ Using tuned settings from {path}: {tuning}")
+    init_tensorflow(
+        intra_op_threads=tuning.get('intra_op_threads'),
+        inter_op_threads=tuning.get('inter_op_threads')
+    )
+    classifier.steps_per_execution = tuning.get('steps_per_execution', 1)
+    return tuning.get('batch_size', BATCH_SIZE)
+
+def total_memory_gb():
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / 1024 ** 3
+
+def run_probe(config, steps, warmup_steps):
+    """Child-process side: time training steps for one configuration on synthetic data"""
+    import numpy as np
+    from model import CatDogClassifier, init_tensorflow
+
+    tf = init_tensorflow(intra_op_threads=config['intra_op_threads'],
+                         inter_op_threads=config['inter_op_threads'])
+    classifier = CatDogClassifier()
+    classifier.steps_per_execution = config['steps_per_execution']
+    classifier.create_model(weights=None)
+
+    batch_size = config['batch_size']
+    rng = np.random.default_rng(0)
+    images = rng.integers(0, 256, (batch_size, *IMG_SIZE, 3), dtype=np.uint8)
+    labels = np.eye(len(CLASS_NAMES), dtype=np.float32)[rng.integers(0, len(CLASS_NAMES), batch_size)]
+    dataset = tf.data.Dataset.from_tensors((images, labels)).repeat().prefetch(2)
+
+    # Round steps up so every execution runs a full steps_per_execution chunk
+    spe = config['steps_per_execution']
+    warmup = max(warmup_steps, spe) // spe * spe
+    measured = max(steps, spe) // spe * spe
+    classifier.model.fit(dataset, steps_per_epoch=warmup, epochs=1, verbose=0)
+    start = time.perf_counter()
+    classifier.model.fit(dataset, steps_per_epoch=measured, epochs=1, verbose=0)
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss is in KiB on Linux
+    peak_rss_gb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 ** 2
+    return {'images_per_sec': measured * batch_size / elapsed, 'peak_rss_gb': peak_rss_gb}
+
+def probe(config, steps, warmup_steps, timeout):
+    """Run one probe in a fresh interpreter, since thread pools are fixed per process"""
+    command = [sys.executable, __file__, '--probe', json.dumps(config),
+               '--steps', str(steps), '--warmup-steps', str(warmup_steps)]
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return None
+    if result.returncode != 0:
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def tune(batch_sizes=TUNE_BATCH_SIZES, steps_per_execution=TUNE_STEPS_PER_EXECUTION,
+         memory_limit_gb=TUNE_MEMORY_LIMIT_GB, steps=20, warmup_steps=5, timeout=600, output=TUNING_PATH):
+    """Coordinate search: batch size, then thread pools, then steps_per_execution"""
+    cpus = os.cpu_count() or 1
+    memory_limit_gb = memory_limit_gb or 0.8 * total_memory_gb()
+    thread_options = sorted({(cpus, 1), (cpus, 2), (max(cpus // 2, 1), 2), (0, 0)})
+    trials = []
+
+    def evaluate(config):
+        print(f"Probing {config}...", end=' ', flush=True)
+        result = probe(config, steps, warmup_steps, timeout)
+        if result is None:
+            print("failed")
+        elif result['peak_rss_gb'] > memory_limit_gb:
+            print(f"over memory limit ({result['peak_rss_gb']:.1f} GB)")
+            result = None
+        else:
+            print(f"{result['images_per_sec']:.1f} images/sec, {result['peak_rss_gb']:.1f} GB")
+        trials.append({'config': config, 'result': result})
+        return result['images_per_sec'] if result else 0.0
+
+    best = {'batch_size': BATCH_SIZE, 'intra_op_threads': 0, 'inter_op_threads': 0, 'steps_per_execution': 1}
+    stages = [
+        [{'batch_size': b} for b in batch_sizes],
+        [{'intra_op_threads': intra, 'inter_op_threads': inter} for intra, inter in thread_options],
+        [{'steps_per_execution': spe} for spe in steps_per_execution]
+    ]
+    best_score = 0.0
+    for stage in stages:
+        for change in stage:
+            candidate = {**best, **change}
+            if any(t['config'] == candidate for t in trials):
+                continue
+            score = evaluate(candidate)
+            if score > best_score:
+                best, best_score = candidate, score
+
+    if best_score == 0.0:
+        raise RuntimeError("No tuning probe succeeded within the memory limit")
+
+    # 0 means "TF default"; store None so init_tensorflow leaves it alone
+    saved = {k: (v or None) if k.endswith('_threads') else v for k, v in best.items()}
+    with open(output, 'w') as f:
+        json.dump({
+            'best': saved,
+            'images_per_sec': best_score,
+            'cpu_count': cpus,
+            'memory_limit_gb': memory_limit_gb,
+            'trials': trials
+        }, f, indent=2)
+    print(f"\n✅ Best: {saved} at {best_score:.1f} images/sec, saved to {output}")
+    return saved
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune batch size, TF threading and steps_per_execution for this machine")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=TUNE_BATCH_SIZES)
+    parser.add_argument('--steps-per-execution', type=int, nargs='+', default=TUNE_STEPS_PER_EXECUTION)
+    parser.add_argument('--memory-limit-gb', type=float, default=TUNE_MEMORY_LIMIT_GB)
+    parser.add_argument('--steps', type=int, default=20, help="Timed training steps per probe")
+    parser.add_argument('--warmup-steps', type=int, default=5)
+    parser.add_argument('--output', default=TUNING_PATH)
+    parser.add_argument('--probe', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        print(json.dumps(run_probe(json.loads(args.probe), args.steps, args.warmup_steps)))
+    else:
+        tune(args.batch_sizes, args.steps_per_execution, args.memory_limit_gb,
+             args.steps, args.warmup_steps, output=args.output)
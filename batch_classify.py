@@ -0,0 +1,238 @@
+import argparse
+import csv
+import glob
+import os
+import sys
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+
+from model import IMAGE_EXTENSIONS, CatDogClassifier, load_image
+from constants import *
+
+OUTPUT_FIELDS = ['path', 'predicted_class', 'confidence'] + [f'prob_{name}' for name in CLASS_NAMES]
+
+def collect_inputs(sources):
+    """Expand directories, globs and list files into a sorted list of image paths"""
+    paths = set()
+    for source in sources:
+        source_path = Path(source)
+        if source_path.is_dir():
+            for path in source_path.rglob('*'):
+                if path.suffix.lower() in IMAGE_EXTENSIONS:
+                    paths.add(str(path))
+        elif source_path.is_file() and source_path.suffix.lower() == '.txt':
+            with open(source_path) as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        paths.add(line)
+        elif source_path.is_file():
+            paths.add(str(source_path))
+        else:
+            for path in glob.glob(source, recursive=True):
+                if Path(path).suffix.lower() in IMAGE_EXTENSIONS:
+                    paths.add(path)
+    return sorted(paths)
+
+def parse_shard(spec):
+    """Parse an 'i/n' shard spec into (index, count)"""
+    try:
+        index, count = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{spec}', expected i/n")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{spec}', need 0 <= i < n")
+    return index, count
+
+def in_shard(path, shard):
+    """Stable path-hash sharding so every node agrees without coordination"""
+    index, count = shard
+    return zlib.crc32(path.encode('utf-8')) % count == index
+
+def load_images(paths, size):
+    """One decode worker task: (path, array or None) for a chunk of paths"""
+    return [(path, load_image(path, size)) for path in paths]
+
+def decode_bounded(pool, paths, size, chunksize, max_in_flight):
+    """Yield (path, array or None) as chunks finish decoding, in completion order.
+
+    At most `max_in_flight` chunks are queued or decoded but not yet consumed,
+    so memory stays flat however far decoding could run ahead of the model.
+    """
+    chunks = iter(range(0, len(paths), chunksize))
+    pending = set()
+    while True:
+        for start in chunks:
+            pending.add(pool.submit(load_images, paths[start:start + chunksize], size))
+            if len(pending) >= max_in_flight:
+                break
+        if not pending:
+            return
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield from future.result()
+
+class CsvSink:
+    """Append rows to a CSV file, flushing after every batch"""
+    def __init__(self, path):
+        self.path = Path(path)
+        if self.path.exists():
+            self._drop_partial_row()
+        exists = self.path.exists() and self.path.stat().st_size > 0
+        self.file = open(self.path, 'a', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=OUTPUT_FIELDS)
+        if not exists:
+            self.writer.writeheader()
+
+    def _drop_partial_row(self):
+        """Truncate a last row cut off by a crash mid-write, so appended rows start on their own line"""
+        with open(self.path, 'rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(position - 65536, 0)
+                f.seek(start)
+                block = f.read(position - start)
+                newline = block.rfind(b'\n')
+                if newline != -1:
+                    if start + newline + 1 != end:
+                        f.truncate(start + newline + 1)
+                    return
+                position = start
+            f.truncate(0)
+
+    def completed(self):
+        if not self.path.exists():
+            return set()
+        with open(self.path, newline='') as f:
+            return {row['path'] for row in csv.DictReader(f) if row.get('path')}
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+class ParquetSink:
+    """Write each batch as its own part file inside a dataset directory"""
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa, self.pq = pa, pq
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.part = len(list(self.path.glob('part-*.parquet')))
+
+    def completed(self):
+        done = set()
+        for part in sorted(self.path.glob('part-*.parquet')):
+            done.update(self.pq.read_table(part, columns=['path']).column('path').to_pylist())
+        return done
+
+    def write(self, rows):
+        table = self.pa.Table.from_pylist(rows)
+        final = self.path / f'part-{self.part:06d}.parquet'
+        tmp = final.with_suffix('.tmp')
+        self.pq.write_table(table, tmp)
+        os.replace(tmp, final)  # a crash never leaves a half-written part behind
+        self.part += 1
+
+    def close(self):
+        pass
+
+def output_has_rows(output):
+    """True if `output` already holds results a new run would append to"""
+    path = Path(output)
+    if path.is_dir():
+        return any(path.glob('part-*.parquet'))
+    return path.exists() and path.stat().st_size > 0
+
+def open_sink(output):
+    if output.endswith('.parquet'):
+        return ParquetSink(output)
+    return CsvSink(output)
+
+def classify_batch(classifier, paths, arrays, batch_size):
+    """Run one fixed-size batch through the model and build output rows"""
+    batch = np.zeros((batch_size, *classifier.img_size, 3), dtype=np.uint8)
+    batch[:len(arrays)] = np.stack(arrays)
+    probabilities = classifier.predict_batch(batch)[:len(arrays)]
+
+    rows = []
+    for path, probs in zip(paths, probabilities):
+        row = {
+            'path': path,
+            'predicted_class': CLASS_NAMES[int(np.argmax(probs))],
+            'confidence': float(np.max(probs))
+        }
+        for name, value in zip(CLASS_NAMES, probs):
+            row[f'prob_{name}'] = float(value)
+        rows.append(row)
+    return rows
+
+def run(args):
+    if not args.resume and output_has_rows(args.output):
+        # Appending a full second run would duplicate every row
+        sys.exit(f"{args.output} already has results; pass --resume to continue it or choose a new output")
+    paths = [p for p in collect_inputs(args.inputs) if in_shard(p, args.shard)]
+    sink = open_sink(args.output)
+
+    if args.resume:
+        done = sink.completed()
+        paths = [p for p in paths if p not in done]
+        print(f"Resuming: {len(done):,} already classified")
+    print(f"Classifying {len(paths):,} images (shard {args.shard[0]}/{args.shard[1]})")
+
+    classifier = CatDogClassifier()
+    # A mistyped --model must fail the job, not label everything with an untrained head
+    classifier.load_model(args.model, backend=args.backend, fallback=False)
+    if args.backend == 'keras':
+        classifier.set_execution_mode(args.execution_mode)
+
+    processed = skipped = 0
+    batch_paths, batch_arrays = [], []
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            # Bounded, so decoded images never pile up in memory faster than the model consumes them
+            decoded = decode_bounded(pool, paths, classifier.img_size, args.chunksize, 2 * args.workers)
+            for path, array in decoded:
+                if array is None:
+                    skipped += 1
+                    print(f"Skipping unreadable image: {path}", file=sys.stderr)
+                    continue
+                batch_paths.append(path)
+                batch_arrays.append(array)
+                if len(batch_arrays) == args.batch_size:
+                    sink.write(classify_batch(classifier, batch_paths, batch_arrays, args.batch_size))
+                    processed += len(batch_arrays)
+                    batch_paths, batch_arrays = [], []
+                    print(f"\rClassified: {processed:,}/{len(paths):,}", end='', flush=True)
+            if batch_arrays:
+                sink.write(classify_batch(classifier, batch_paths, batch_arrays, args.batch_size))
+                processed += len(batch_arrays)
+    finally:
+        sink.close()
+
+    print(f"\n✅ Classified {processed:,} images, skipped {skipped:,}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk offline cat/dog/other classification")
+    parser.add_argument('inputs', nargs='+', help="Directories, glob patterns or .txt files listing image paths")
+    parser.add_argument('-o', '--output', required=True, help="Output .csv file or .parquet dataset directory")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--backend', default=INFERENCE_BACKEND, choices=['keras', 'savedmodel', *TFLITE_PATHS])
+    parser.add_argument('--execution-mode', default=EXECUTION_MODE, choices=EXECUTION_MODES)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunksize', type=int, default=64, help="Images handed to each decode worker at a time")
+    parser.add_argument('--shard', type=parse_shard, default=(0, 1), help="Process only shard i of n, e.g. 2/8")
+    parser.add_argument('--resume', action='store_true', help="Skip images already present in the output")
+    run(parser.parse_args(argv))
+
+if __name__ == "__main__":
+    main()
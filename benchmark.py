@@ -0,0 +1,287 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from constants import *
+
+def make_synthetic_corpus(root, images_per_class=64, size=(1024, 768), seed=0):
+    """Write random JPEGs in data/{train,val}/{class} layout so benchmarks run offline"""
+    rng = np.random.default_rng(seed)
+    root = Path(root)
+    for split, count in (('train', images_per_class), ('val', max(images_per_class // 4, 1))):
+        for class_name in CLASS_NAMES:
+            class_dir = root / split / class_name
+            class_dir.mkdir(parents=True, exist_ok=True)
+            for i in range(count):
+                # Smooth gradients plus noise compress like photos, unlike pure noise
+                base = np.linspace(0, 255, size[0], dtype=np.float32)[np.newaxis, :, np.newaxis]
+                noise = rng.normal(0, 25, (size[1], size[0], 3))
+                pixels = np.clip(base + rng.uniform(-60, 60, 3) + noise, 0, 255).astype(np.uint8)
+                Image.fromarray(pixels).save(class_dir / f"{i:05d}.jpg", quality=90)
+    return {'train': root / 'train', 'val': root / 'val'}
+
+def percentiles(timings_ms):
+    return {
+        'mean_ms': float(np.mean(timings_ms)),
+        'p50_ms': float(np.percentile(timings_ms, 50)),
+        'p95_ms': float(np.percentile(timings_ms, 95)),
+        'p99_ms': float(np.percentile(timings_ms, 99))
+    }
+
+def bench_preprocess(paths, repeats=3, draft=True):
+    """PIL decode + resize to a uint8 IMG_SIZE array, per image.
+    
+    draft=True is the production path (reduced-scale JPEG decode); draft=False
+    measures a full-resolution decode for comparison.
+    """
+    from model import preprocess_image
+
+    timings = []
+    for _ in range(repeats):
+        for path in paths:
+            start = time.perf_counter()
+            with Image.open(path) as image:
+                if draft:
+                    preprocess_image(image, IMG_SIZE)
+                else:
+                    np.asarray(image.convert('RGB').resize(IMG_SIZE), dtype=np.uint8)
+            timings.append((time.perf_counter() - start) * 1000)
+    return percentiles(timings)
+
+def bench_predict_latency(classifier, paths, runs=100):
+    """End-to-end CatDogClassifier.predict latency on PIL images"""
+    images = [Image.open(p).copy() for p in paths[:16]]
+    classifier.warm_up()
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        classifier.predict(images[i % len(images)])
+        timings.append((time.perf_counter() - start) * 1000)
+    return percentiles(timings)
+
+def bench_batch_throughput(classifier, batch_sizes, seconds=3.0):
+    """Images/sec of predict_batch on preprocessed uint8 batches"""
+    results = {}
+    rng = np.random.default_rng(0)
+    for batch_size in batch_sizes:
+        batch = rng.integers(0, 256, (batch_size, *classifier.img_size, 3), dtype=np.uint8)
+        classifier.predict_batch(batch)  # warm-up / trace for this shape
+        count, start = 0, time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            classifier.predict_batch(batch)
+            count += batch_size
+        results[str(batch_size)] = count / (time.perf_counter() - start)
+    return results
+
+def bench_inference_paths(classifier, batch_sizes=(1, 2, 4, 8), runs=50):
+    """Small-batch latency of Keras model.predict vs the traced serving function vs an exported SavedModel"""
+    from model import CatDogClassifier
+
+    with tempfile.TemporaryDirectory() as tmp:
+        classifier.export_saved_model(os.path.join(tmp, 'savedmodel'))
+        saved = CatDogClassifier()
+        saved.load_model(os.path.join(tmp, 'savedmodel'), backend='savedmodel')
+        paths = {
+            'keras_predict': lambda x: classifier.model.predict(x, batch_size=len(x), verbose=0),
+            'traced_function': classifier.predict_batch,
+            'savedmodel': saved.predict_batch
+        }
+        rng = np.random.default_rng(0)
+        results = {}
+        for batch_size in batch_sizes:
+            batch = rng.integers(0, 256, (batch_size, *classifier.img_size, 3), dtype=np.uint8)
+            for name, run in paths.items():
+                run(batch)  # warm-up
+                timings = []
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    run(batch)
+                    timings.append((time.perf_counter() - start) * 1000)
+                results.setdefault(name, {})[str(batch_size)] = percentiles(timings)
+    return results
+
+def bench_video(classifier, root, seconds=10, fps=30):
+    """video.classify_video throughput on a synthetic clip: a square drifting across a still background"""
+    import cv2
+    from video import classify_video
+
+    path = str(Path(root) / 'synthetic.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (320, 240))
+    background = np.random.default_rng(0).integers(0, 256, (240, 320, 3), dtype=np.uint8)
+    for i in range(seconds * fps):
+        frame = background.copy()
+        x = (i * 2) % 280
+        frame[100:140, x:x + 40] = 255
+        writer.write(frame)
+    writer.release()
+
+    results = {}
+    for name, options in {'every_frame': {'sample_fps': 0, 'scene_threshold': 0},
+                          'default_sampling': {}}.items():
+        result = classify_video(classifier, path, **options)
+        results[name] = {'frames_sampled_count': result['frames_sampled'],
+                         'frames_classified_count': result['frames_classified'],
+                         'sampled_fps': result['sampled_fps'], 'classified_fps': result['classified_fps']}
+    return results
+
+def repeat_batches(sequence):
+    """Endless generator over a finite Keras Sequence, so fit can run any number of steps"""
+    while True:
+        for i in range(len(sequence)):
+            yield sequence[i]
+
+def bench_training(classifier, train_data, steps, warmup_steps=2):
+    """Training steps/sec of model.fit over `steps` batches, after a warm-up.
+
+    `train_data` must yield at least warmup_steps + steps batches; wrap finite
+    Sequences with repeat_batches().
+    """
+    import tensorflow as tf
+
+    class StepTimer(tf.keras.callbacks.Callback):
+        def __init__(self):
+            super().__init__()
+            self.times = []
+
+        def on_train_batch_end(self, batch, logs=None):
+            self.times.append(time.perf_counter())
+
+    timer = StepTimer()
+    classifier.model.fit(train_data, steps_per_epoch=warmup_steps + steps, epochs=1,
+                         callbacks=[timer], verbose=0)
+    measured = timer.times[max(warmup_steps - 1, 0):]
+    if len(measured) < 2:
+        return {'steps_per_sec': None}
+    return {'steps_per_sec': (len(measured) - 1) / (measured[-1] - measured[0])}
+
+def bench_cold_start(runs=3):
+    """Seconds for a fresh interpreter to import model.py, initialise TF, and start the CLIs"""
+    commands = {
+        'import_model': ['-c', 'import model'],
+        'import_model_init_tensorflow': ['-c', 'import model; model.init_tensorflow()'],
+        'batch_classify_help': ['batch_classify.py', '--help'],
+        'dataset_cache_help': ['dataset_cache.py', '--help']
+    }
+    results = {}
+    for name, args in commands.items():
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, *args], cwd=Path(__file__).parent,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            timings.append(time.perf_counter() - start)
+        results[f"{name}_s"] = float(np.median(timings))
+    return results
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+def run_benchmarks(output='benchmark.json', images_per_class=64, batch_sizes=(1, 8, 32, 128),
+                   train_steps=10, corpus_dir=None):
+    """Run the full suite on a synthetic corpus and write machine-readable results"""
+    import tensorflow as tf
+    from model import CatDogClassifier
+    from data_loader import DataLoader
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(corpus_dir or tmp)
+        dirs = make_synthetic_corpus(root, images_per_class)
+        paths = sorted(dirs['val'].rglob('*.jpg'))
+
+        # Random weights: latency does not depend on them and nothing is downloaded
+        classifier = CatDogClassifier()
+        classifier.create_model(weights=None)
+
+        results = {
+            'meta': {
+                'commit': git_commit(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'tensorflow': tf.__version__,
+                'cpu_count': os.cpu_count(),
+                'machine': platform.machine(),
+                'img_size': list(IMG_SIZE),
+                'images_per_class': images_per_class
+            },
+            'cold_start': bench_cold_start(),
+            'preprocess': bench_preprocess(paths),
+            'preprocess_full_decode': bench_preprocess(paths, draft=False),
+            'predict_latency': bench_predict_latency(classifier, paths),
+            'batch_throughput_images_per_sec': bench_batch_throughput(classifier, batch_sizes),
+            'inference_paths': bench_inference_paths(classifier),
+            'video': bench_video(classifier, root)
+        }
+
+        data_loader = DataLoader(root)
+        train_gen, _ = data_loader.create_data_generators(dirs['train'], dirs['val'])
+        train_ds, _ = data_loader.create_tf_datasets(dirs['train'], dirs['val'])
+        model_gen, _ = classifier.create_generators(dirs['train'], dirs['val'], batch_size=BATCH_SIZE)
+        results['training'] = {
+            'data_loader_generator': bench_training(classifier, repeat_batches(train_gen), train_steps),
+            'data_loader_tf_data': bench_training(classifier, train_ds.repeat(), train_steps),
+            'classifier_train_model': bench_training(classifier, repeat_batches(model_gen), train_steps)
+        }
+
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    return results
+
+def flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(baseline_path, current, tolerance=0.10):
+    """Print metrics that regressed by more than `tolerance`; returns the regression list"""
+    with open(baseline_path) as f:
+        baseline = flatten({k: v for k, v in json.load(f).items() if k != 'meta'})
+    current = flatten({k: v for k, v in current.items() if k != 'meta'})
+
+    regressions = []
+    for name, old in baseline.items():
+        new = current.get(name)
+        # Counts describe the workload, not its speed
+        if new is None or old == 0 or name.endswith('_count'):
+            continue
+        # Latencies regress upwards, throughputs downwards
+        change = (new - old) / old if name.endswith(('_ms', '_s')) else (old - new) / old
+        if change > tolerance:
+            regressions.append((name, old, new))
+            print(f"⚠️ {name}: {old:.3f} -> {new:.3f}")
+    if not regressions:
+        print(f"✅ No regressions beyond {tolerance:.0%}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline CPU benchmark suite (writes JSON)")
+    parser.add_argument('-o', '--output', default='benchmark.json')
+    parser.add_argument('--images-per-class', type=int, default=64)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32, 128])
+    parser.add_argument('--train-steps', type=int, default=10)
+    parser.add_argument('--corpus-dir', help="Keep the synthetic corpus here instead of a temp dir")
+    parser.add_argument('--compare', help="Baseline JSON to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args()
+    results = run_benchmarks(args.output, args.images_per_class, args.batch_sizes,
+                             args.train_steps, args.corpus_dir)
+    if args.compare and compare(args.compare, results, args.tolerance):
+        raise SystemExit(1)
@@ -0,0 +1,238 @@
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from constants import *
+from metrics import METRICS
+from model import CatDogClassifier, init_tensorflow, preprocess_batch, preprocess_image
+from prediction_cache import model_fingerprint
+
+def downscale(images, size):
+    """Area-resize a uint8 (N, H, W, 3) batch to `size` for the small model"""
+    if images.shape[1:3] == tuple(size):
+        return images
+    tf = init_tensorflow()
+    return tf.image.resize(images, size, method='area').numpy().round().astype(np.uint8)
+
+class CascadeClassifier:
+    """Two-stage classifier: the small model answers first, the full model only when it is unsure.
+
+    Images arrive at the full model's resolution and are downscaled for the
+    small model. Any image whose top small-model probability is below
+    `threshold` is re-run through the full model, whose scores replace the
+    small model's. Exposes the same predict/predict_many/predict_batch
+    interface as CatDogClassifier.
+    """
+    def __init__(self, full, small, threshold=CASCADE_THRESHOLD, calibration=None, model_paths=()):
+        self.full = full
+        self.small = small
+        self.threshold = threshold
+        self.calibration = calibration or {}
+        self.classes = full.classes
+        self.img_size = full.img_size
+        # Files the predictions depend on, for PredictionCache
+        self.model_paths = tuple(model_paths)
+        self.lock = threading.Lock()
+        self.images = 0
+        self.escalated = 0
+
+    def predict(self, image):
+        if isinstance(image, str):
+            image = Image.open(image)
+        return self.predict_many([image])[0]
+
+    def predict_many(self, images):
+        """Classify several PIL images; returns a list of (class, confidence, probabilities)"""
+        probabilities = self.predict_batch(preprocess_batch(images, self.img_size))
+        with METRICS.time('postprocess'):
+            return [(self.classes[np.argmax(p)], float(np.max(p)), p) for p in probabilities]
+
+    def predict_batch(self, images):
+        """Class probabilities for a uint8 batch at the full model's input size"""
+        images = np.asarray(images, dtype=np.uint8)
+        probabilities = self.small.predict_batch(downscale(images, self.small.img_size))
+        uncertain = np.flatnonzero(probabilities.max(axis=1) < self.threshold)
+        if len(uncertain):
+            probabilities[uncertain] = self.full.predict_batch(images[uncertain])
+        with self.lock:
+            self.images += len(images)
+            self.escalated += len(uncertain)
+        return probabilities
+
+    def warm_up(self):
+        self.small.warm_up()
+        self.full.warm_up()
+
+    def stats(self):
+        """Escalation counters plus the accuracy measured on data/val when the threshold was calibrated"""
+        with self.lock:
+            images, escalated = self.images, self.escalated
+        return {
+            'threshold': self.threshold,
+            'images': images,
+            'escalated': escalated,
+            'escalation_rate': escalated / images if images else 0.0,
+            'val_accuracy': self.calibration.get('val_accuracy'),
+            'val_escalation_rate': self.calibration.get('escalation_rate')
+        }
+
+    def prometheus(self, prefix='catdog_cascade'):
+        stats = self.stats()
+        return (f"# TYPE {prefix}_images_total counter\n{prefix}_images_total {stats['images']}\n"
+                f"# TYPE {prefix}_escalated_total counter\n{prefix}_escalated_total {stats['escalated']}\n")
+
+def load_cascade(full_path=MODEL_PATH, small_path=CASCADE_SMALL_MODEL_PATH, config_path=CASCADE_CONFIG_PATH,
+                 backend='keras', execution_mode='eager'):
+    """Load both models and the calibrated threshold (CASCADE_THRESHOLD if none has been calibrated)"""
+    if not os.path.exists(small_path):
+        raise FileNotFoundError(f"Small model {small_path} not found; run python cascade.py train-small")
+    full = CatDogClassifier()
+    full.load_model(full_path, backend=backend, fallback=False)
+    small = CatDogClassifier()
+    # An untrained small model would answer confidently at random without escalating
+    small.load_model(small_path, fallback=False)
+    if backend == 'keras':
+        full.set_execution_mode(execution_mode)
+    small.set_execution_mode(execution_mode)
+
+    calibration, threshold = {}, CASCADE_THRESHOLD
+    if os.path.exists(config_path):
+        with open(config_path) as f:
+            calibration = json.load(f)
+        threshold = calibration['threshold']
+        models = {'full': model_fingerprint(full_path), 'small': model_fingerprint(small_path)}
+        if calibration.get('models') != models:
+            print(f"⚠️ Models changed since {config_path} was written; rerun python cascade.py calibrate")
+    return CascadeClassifier(full, small, threshold, calibration,
+                             model_paths=(TFLITE_PATHS.get(backend, full_path), small_path))
+
+def train_small(train_dir='data/train', val_dir='data/val', epochs=EPOCHS, batch_size=32,
+                config=CASCADE_SMALL_MODEL, output=CASCADE_SMALL_MODEL_PATH):
+    """Train the cascade's first-stage model (frozen backbone, early stopping) and save it"""
+    from data_loader import DataLoader
+    from sweep import build_candidate
+
+    init_tensorflow()
+    classifier = build_candidate(config)
+    train_ds, val_ds = DataLoader().create_tf_datasets(train_dir, val_dir, batch_size=batch_size,
+                                                       img_size=classifier.img_size)
+    classifier._fit(train_ds, val_ds, epochs)
+    classifier.save_model(output)
+    print(f"✅ Small model saved to {output}")
+
+def collect_predictions(cascade, val_dir='data/val', batch_size=64):
+    """Small- and full-model probabilities for every validation image, plus labels and per-image latency"""
+    from manifest import open_split
+
+    manifest, split = open_split(val_dir, quick=True)
+    class_names, samples = manifest.samples(split)
+    manifest.close()
+    label_index = [cascade.classes.index(name) for name in class_names]
+
+    small_probs, full_probs, labels = [], [], []
+    small_seconds = full_seconds = 0.0
+    for start in range(0, len(samples), batch_size):
+        chunk = samples[start:start + batch_size]
+        batch = np.empty((len(chunk), cascade.img_size[1], cascade.img_size[0], 3), dtype=np.uint8)
+        for i, (path, _) in enumerate(chunk):
+            with Image.open(path) as image:
+                batch[i] = preprocess_image(image, cascade.img_size)
+        small_batch = downscale(batch, cascade.small.img_size)
+
+        begin = time.perf_counter()
+        small_probs.append(cascade.small.predict_batch(small_batch))
+        small_seconds += time.perf_counter() - begin
+        begin = time.perf_counter()
+        full_probs.append(cascade.full.predict_batch(batch))
+        full_seconds += time.perf_counter() - begin
+        labels.extend(label_index[label] for _, label in chunk)
+
+    count = max(len(labels), 1)
+    return (np.concatenate(small_probs), np.concatenate(full_probs), np.array(labels),
+            {'small_ms': 1000 * small_seconds / count, 'full_ms': 1000 * full_seconds / count})
+
+def threshold_curve(small_probs, full_probs, labels, thresholds, latency):
+    """End-to-end accuracy, escalation rate and cost relative to the full model alone for each threshold"""
+    small_pred, full_pred = small_probs.argmax(axis=1), full_probs.argmax(axis=1)
+    confidence = small_probs.max(axis=1)
+    curve = []
+    for threshold in thresholds:
+        escalate = confidence < threshold
+        predicted = np.where(escalate, full_pred, small_pred)
+        rate = float(escalate.mean())
+        curve.append({
+            'threshold': float(threshold),
+            'val_accuracy': float((predicted == labels).mean()),
+            'escalation_rate': rate,
+            'relative_cost': (latency['small_ms'] + rate * latency['full_ms']) / latency['full_ms']
+        })
+    return curve
+
+def calibrate(val_dir='data/val', target=CASCADE_TARGET_ACCURACY, full_path=MODEL_PATH,
+              small_path=CASCADE_SMALL_MODEL_PATH, output=CASCADE_CONFIG_PATH, batch_size=64):
+    """Pick the threshold with the fewest escalations whose end-to-end accuracy on val_dir reaches `target`"""
+    cascade = load_cascade(full_path, small_path, config_path='')
+    small_probs, full_probs, labels, latency = collect_predictions(cascade, val_dir, batch_size)
+    # 1.0 escalates everything, i.e. the full model alone
+    thresholds = sorted({*np.round(np.arange(0.50, 1.0, 0.01), 2), MEDIUM_CONFIDENCE, HIGH_CONFIDENCE, 1.0})
+    curve = threshold_curve(small_probs, full_probs, labels, thresholds, latency)
+
+    passing = [point for point in curve if point['val_accuracy'] >= target]
+    if passing:
+        best = min(passing, key=lambda point: (point['escalation_rate'], point['threshold']))
+    else:
+        best = max(curve, key=lambda point: (point['val_accuracy'], -point['escalation_rate']))
+        print(f"⚠️ No threshold reaches {target:.1%}; using the most accurate one")
+
+    print(f"{'threshold':>9} {'accuracy':>9} {'escalated':>10} {'cost':>6}")
+    for point in curve:
+        if point['threshold'] in (MEDIUM_CONFIDENCE, HIGH_CONFIDENCE, 1.0) or point is best:
+            marker = '  <- chosen' if point is best else ''
+            print(f"{point['threshold']:>9.2f} {point['val_accuracy']:>9.1%} {point['escalation_rate']:>10.1%} "
+                  f"{point['relative_cost']:>6.2f}{marker}")
+
+    result = {
+        **best,
+        'target': target,
+        'images': int(len(labels)),
+        'small_only_accuracy': float((small_probs.argmax(axis=1) == labels).mean()),
+        'full_only_accuracy': float((full_probs.argmax(axis=1) == labels).mean()),
+        'latency_ms': latency,
+        'models': {'full': model_fingerprint(full_path), 'small': model_fingerprint(small_path)},
+        'curve': curve
+    }
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"✅ Threshold {best['threshold']:.2f}: {best['val_accuracy']:.1%} accuracy, "
+          f"{best['escalation_rate']:.1%} escalated, {best['relative_cost']:.2f}x full-model cost. Saved to {output}")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Small-model-first cascade: train the small model and calibrate its threshold")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    train = subparsers.add_parser('train-small', help="Train the first-stage model described by CASCADE_SMALL_MODEL")
+    train.add_argument('--data-dir', default='data')
+    train.add_argument('--epochs', type=int, default=EPOCHS)
+    train.add_argument('--batch-size', type=int, default=32)
+    train.add_argument('-o', '--output', default=CASCADE_SMALL_MODEL_PATH)
+
+    calib = subparsers.add_parser('calibrate', help="Choose the escalation threshold on the validation set")
+    calib.add_argument('--val-dir', default='data/val')
+    calib.add_argument('--target', type=float, default=CASCADE_TARGET_ACCURACY)
+    calib.add_argument('--model', default=MODEL_PATH)
+    calib.add_argument('--small-model', default=CASCADE_SMALL_MODEL_PATH)
+    calib.add_argument('--batch-size', type=int, default=64)
+    calib.add_argument('-o', '--output', default=CASCADE_CONFIG_PATH)
+
+    args = parser.parse_args()
+    if args.command == 'train-small':
+        train_small(f"{args.data_dir}/train", f"{args.data_dir}/val", args.epochs, args.batch_size,
+                    output=args.output)
+    else:
+        calibrate(args.val_dir, args.target, args.model, args.small_model, args.output, args.batch_size)
@@ -1,5 +1,18 @@
 # Model Configuration
 MODEL_PATH = 'cat_dog_model.h5'
+# Runtime: TensorFlow loads lazily via model.init_tensorflow()
+MIXED_PRECISION = 'auto'  # 'auto' = mixed_float16 on GPU only, or True / False
+GPU_MEMORY_GROWTH = True
+EXECUTION_MODES = ['eager', 'xla', 'bf16', 'xla_bf16']
+EXECUTION_MODE = 'eager'  # XLA JIT and/or bfloat16 mixed precision; compare with execution_modes.py
+INFERENCE_BACKEND = 'keras'  # keras, savedmodel, tflite-fp32, tflite-fp16 or tflite-int8
+# SavedModel with a fixed uint8 serving signature (written by export_tflite.py)
+SAVEDMODEL_PATH = 'cat_dog_model_savedmodel'
+TFLITE_PATHS = {
+    'tflite-fp32': 'cat_dog_model_fp32.tflite',
+    'tflite-fp16': 'cat_dog_model_fp16.tflite',
+    'tflite-int8': 'cat_dog_model_int8.tflite'
+}
 IMG_SIZE = (128, 128)
 BATCH_SIZE = 128  # GPU optimized
 EPOCHS = 10
@@ -26,6 +39,19 @@ HEIGHT_SHIFT_RANGE = 0.2
 SHEAR_RANGE = 0.2
 ZOOM_RANGE = 0.2
 HORIZONTAL_FLIP = True
+BRIGHTNESS_RANGE = (0.8, 1.2)
+
+# Input Pipeline ('generator' = ImageDataGenerator, 'tf.data' = parallel tf.data,
+# 'cache' = decode-once memory-mapped shards)
+DATA_PIPELINE = 'generator'
+SHUFFLE_BUFFER = 2048
+CACHE_DIR = 'data/cache'
+CACHE_SHARD_SIZE = 1024
+# Train the frozen-backbone phase on cached embeddings instead of images
+USE_FEATURE_CACHE = False
+# SQLite index of every image (size, mtime, dimensions, content hash), kept inside the data directory
+MANIFEST_FILENAME = 'manifest.sqlite'
+MANIFEST_LOCK_TIMEOUT = 120  # Seconds to wait for another process's write to finish
 
 # Training Parameters
 VALIDATION_SPLIT = 0.2
@@ -41,8 +67,84 @@ DATASET_URLS = {
     'cats_vs_dogs_redux': 'https://www.kaggle.com/c/dogs-vs-cats-redux-kernels-edition'
 }
 
-# Model Architecture
+# Per-stage latency histograms (fetch/decode/preprocess/queue/infer/postprocess)
+METRICS_ENABLED = True
+# TensorBoard profiler traces from train_model.py --profile-steps
+PROFILE_LOG_DIR = 'logs/profile'
+
+# Resumable training (python train_model.py --resume)
+CHECKPOINT_DIR = 'checkpoints/train_state'
+CHECKPOINT_EVERY_EPOCHS = 1
+
+# CPU Auto-Tuning (python autotune.py writes TUNING_PATH; training picks it up)
+TUNING_PATH = 'tuning.json'
+TUNE_BATCH_SIZES = [16, 32, 64, 128, 256]
+TUNE_STEPS_PER_EXECUTION = [1, 4, 16, 64]
+TUNE_MEMORY_LIMIT_GB = None  # Default: 80% of physical memory
+
+# Dataset Download
+PET_IMAGES_URL = 'https://download.microsoft.com/download/3/E/1/3E1C3F21-ECDB-4869-8368-6DEBA77B919F/kagglecatsanddogs_5340.zip'
+PET_IMAGES_SHA256 = None  # Set to pin the archive; size is always checked against the server
+DOWNLOAD_MIRROR_DIR = None  # Local directory holding pre-fetched archives
+DOWNLOAD_WORKERS = 8
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+IMAGES_PER_CLASS = 2000  # Up to 12,500 per class in PetImages
+
+# Image URL Fetching
+FETCH_CONNECT_TIMEOUT = 3.05
+FETCH_READ_TIMEOUT = 10
+FETCH_TOTAL_TIMEOUT = 20
+FETCH_WORKERS = 8
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+MAX_IMAGE_PIXELS = 40_000_000
+
+# Inference Service
+SERVE_HOST = '127.0.0.1'
+SERVE_PORT = 8080
+SERVE_MAX_BATCH_SIZE = 32
+SERVE_MAX_WAIT_MS = 5
+# Forked server processes; more than one maps a single read-only TFLite copy of the weights
+# (SHARED_WEIGHTS_BACKEND unless --backend is already TFLite); compare with python shared_weights.py report
+SERVE_WORKERS = 1
+SHARED_WEIGHTS_BACKEND = 'tflite-fp32'
+
+# Prediction Cache (keyed by image bytes or URL validators + model fingerprint)
+PREDICTION_CACHE_PATH = 'prediction_cache.sqlite'
+PREDICTION_CACHE_MEMORY_ENTRIES = 10_000
+PREDICTION_CACHE_DISK_ENTRIES = 1_000_000
+
+# Model Architecture (MobileNetV2, MobileNetV3Small, MobileNetV3Large or EfficientNetB0;
+# compare them with python sweep.py)
 BASE_MODEL = 'MobileNetV2'
+BACKBONE_ALPHA = 1.0  # MobileNet width multiplier; ignored by EfficientNet
 FINE_TUNE_LAYERS = 20
 DROPOUT_RATE = 0.2
-DENSE_UNITS = 64
\ No newline at end of file
+DENSE_UNITS = 64
+
+# Backbone sweep: each candidate trains the head for SWEEP_EPOCHS, then is timed on CPU
+SWEEP_CANDIDATES = [
+    {'base_model': 'MobileNetV2', 'alpha': 1.0, 'img_size': 128},
+    {'base_model': 'MobileNetV2', 'alpha': 0.5, 'img_size': 128},
+    {'base_model': 'MobileNetV2', 'alpha': 0.35, 'img_size': 96},
+    {'base_model': 'MobileNetV3Small', 'alpha': 1.0, 'img_size': 128},
+    {'base_model': 'MobileNetV3Small', 'alpha': 0.75, 'img_size': 96},
+    {'base_model': 'MobileNetV3Large', 'alpha': 1.0, 'img_size': 128},
+    {'base_model': 'EfficientNetB0', 'alpha': 1.0, 'img_size': 128}
+]
+SWEEP_EPOCHS = 3
+SWEEP_TARGET_ACCURACY = 0.90
+
+# Confidence-gated cascade: a small low-resolution model answers first and only
+# images it scores below the threshold go to the full model (python cascade.py)
+USE_CASCADE = False
+CASCADE_SMALL_MODEL = {'base_model': 'MobileNetV3Small', 'alpha': 0.75, 'img_size': 96}
+CASCADE_SMALL_MODEL_PATH = 'cat_dog_model_small.h5'
+CASCADE_THRESHOLD = HIGH_CONFIDENCE  # Used until cascade.py calibrate writes CASCADE_CONFIG_PATH
+CASCADE_CONFIG_PATH = 'cascade.json'
+CASCADE_TARGET_ACCURACY = 0.90
+
+# Video classification (python video.py clip.mp4)
+VIDEO_SAMPLE_FPS = 2  # Frames per second sent to the model; 0 = every frame
+VIDEO_SCENE_THRESHOLD = 4.0  # Mean absolute thumbnail difference (0-255) below which a frame is a near-duplicate
+VIDEO_BATCH_SIZE = 16
+VIDEO_SEGMENT_SECONDS = 5
@@ -1,66 +1,182 @@
 import os
-import requests
 import zipfile
 from pathlib import Path
+import numpy as np
 import tensorflow as tf
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from constants import *
+from downloader import ParallelDownloader
+from manifest import flow_from_manifest, open_split
 
 class DataLoader:
     def __init__(self, data_dir='data'):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
         
-    def download_dataset(self, url, extract_path):
+    def download_dataset(self, url, extract_path, sha256=None):
         """Download and extract dataset"""
         filename = url.split('/')[-1]
         filepath = self.data_dir / filename
         
-        if not filepath.exists():
-            print(f"Downloading {filename}...")
-            response = requests.get(url, stream=True)
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+        print(f"Downloading {filename}...")
+        ParallelDownloader().download(url, filepath, sha256=sha256)
         
         if filename.endswith('.zip'):
             with zipfile.ZipFile(filepath, 'r') as zip_ref:
                 zip_ref.extractall(extract_path)
     
-    def create_data_generators(self, train_dir, val_dir):
+    def create_data_generators(self, train_dir, val_dir, batch_size=BATCH_SIZE):
         """Create training and validation data generators"""
+        # No rescale: the model rescales in-graph, so inputs stay 0-255
         train_datagen = ImageDataGenerator(
-            rescale=1./255,
             rotation_range=ROTATION_RANGE,
             width_shift_range=WIDTH_SHIFT_RANGE,
             height_shift_range=HEIGHT_SHIFT_RANGE,
             shear_range=SHEAR_RANGE,
             zoom_range=ZOOM_RANGE,
             horizontal_flip=HORIZONTAL_FLIP,
-            brightness_range=[0.8, 1.2],
+            brightness_range=list(BRIGHTNESS_RANGE),
             channel_shift_range=0.1,
             fill_mode='nearest'
         )
         
-        val_datagen = ImageDataGenerator(rescale=1./255)
+        val_datagen = ImageDataGenerator()
         
-        train_generator = train_datagen.flow_from_directory(
-            train_dir,
-            target_size=IMG_SIZE,
-            batch_size=BATCH_SIZE,
-            class_mode='categorical',
-            shuffle=True
+        train_generator = flow_from_manifest(train_datagen, train_dir, IMG_SIZE, batch_size, shuffle=True)
+        val_generator = flow_from_manifest(val_datagen, val_dir, IMG_SIZE, batch_size, shuffle=False)
+        
+        return train_generator, val_generator
+    
+    def create_input_pipeline(self, train_dir, val_dir, pipeline=DATA_PIPELINE, batch_size=BATCH_SIZE):
+        """Create train/val inputs using the configured pipeline ('generator', 'tf.data' or 'cache')"""
+        if pipeline == 'tf.data':
+            return self.create_tf_datasets(train_dir, val_dir, batch_size=batch_size)
+        if pipeline == 'cache':
+            return self.create_cached_datasets(train_dir, val_dir, batch_size=batch_size)
+        if pipeline == 'generator':
+            return self.create_data_generators(train_dir, val_dir, batch_size=batch_size)
+        raise ValueError(f"Unknown data pipeline: {pipeline}")
+    
+    def create_tf_datasets(self, train_dir, val_dir, batch_size=BATCH_SIZE, cache=True, img_size=IMG_SIZE):
+        """Create tf.data training and validation datasets.
+        
+        Decoding runs in parallel, decoded images are cached, and augmentation
+        is applied to whole batches inside the graph. `cache` may be True for
+        an in-memory cache or a file path prefix for an on-disk cache.
+        """
+        autotune = tf.data.AUTOTUNE
+        augment = build_augmentation()
+        
+        train_ds = self._image_dataset(train_dir, shuffle=True, cache=cache, cache_suffix='train', img_size=img_size)
+        train_ds = train_ds.shuffle(SHUFFLE_BUFFER, reshuffle_each_iteration=True)
+        train_ds = train_ds.batch(batch_size, num_parallel_calls=autotune)
+        train_ds = train_ds.map(
+            lambda images, labels: (augment(tf.cast(images, tf.float32), training=True), labels),
+            num_parallel_calls=autotune
         )
+        train_ds = train_ds.prefetch(autotune)
+        
+        val_ds = self._image_dataset(val_dir, shuffle=False, cache=cache, cache_suffix='val', img_size=img_size)
+        val_ds = val_ds.batch(batch_size, num_parallel_calls=autotune)
+        val_ds = val_ds.prefetch(autotune)
+        
+        return train_ds, val_ds
+    
+    def create_sharded_dataset(self, directory, training, batch_size, shard, cache=True):
+        """One worker's share of a split for multi-worker training, as repeated fixed-size batches.
+        
+        `shard` is (index, count). Files are sharded before decoding so each
+        worker only reads its own, and partial batches are dropped so every
+        worker runs the same number of steps.
+        """
+        autotune = tf.data.AUTOTUNE
+        ds = self._image_dataset(directory, shuffle=training, cache=cache,
+                                 cache_suffix=f"{Path(directory).name}_{shard[0]}", shard=shard)
+        if training:
+            augment = build_augmentation()
+            ds = ds.shuffle(SHUFFLE_BUFFER, reshuffle_each_iteration=True)
+        ds = ds.repeat().batch(batch_size, drop_remainder=True, num_parallel_calls=autotune)
+        if training:
+            ds = ds.map(
+                lambda images, labels: (augment(tf.cast(images, tf.float32), training=True), labels),
+                num_parallel_calls=autotune
+            )
+        return ds.prefetch(autotune)
+    
+    def create_cached_datasets(self, train_dir, val_dir, batch_size=BATCH_SIZE, cache_dir=CACHE_DIR):
+        """Create tf.data datasets backed by decode-once memory-mapped shards.
+        
+        The caches are (re)built only when the source files or IMG_SIZE change;
+        batches are sliced straight out of the memory maps.
+        """
+        from dataset_cache import SplitCache
+        
+        train_cache = SplitCache(train_dir, cache_dir).build()
+        val_cache = SplitCache(val_dir, cache_dir).build()
+        augment = build_augmentation()
+        
+        train_ds = self._cached_split_dataset(train_cache, batch_size, shuffle=True)
+        train_ds = train_ds.map(
+            lambda images, labels: (augment(tf.cast(images, tf.float32), training=True), labels),
+            num_parallel_calls=tf.data.AUTOTUNE
+        ).prefetch(tf.data.AUTOTUNE)
+        
+        val_ds = self._cached_split_dataset(val_cache, batch_size, shuffle=False)
+        val_ds = val_ds.prefetch(tf.data.AUTOTUNE)
+        
+        return train_ds, val_ds
+    
+    def _cached_split_dataset(self, cache, batch_size, shuffle):
+        """Batched (uint8 image, one-hot label) dataset over a SplitCache"""
+        num_classes = len(cache.class_names)
+        epoch = [0]
+        
+        def batches():
+            # Reshuffled within each shard every epoch, so batches are regrouped too
+            epoch[0] += 1
+            for images, labels in cache.iter_batches(batch_size, shuffle=shuffle, seed=epoch[0]):
+                yield images, np.eye(num_classes, dtype=np.float32)[labels]
         
-        val_generator = val_datagen.flow_from_directory(
-            val_dir,
-            target_size=IMG_SIZE,
-            batch_size=BATCH_SIZE,
-            class_mode='categorical',
-            shuffle=False
+        return tf.data.Dataset.from_generator(
+            batches,
+            output_signature=(
+                tf.TensorSpec(shape=(None, *IMG_SIZE, 3), dtype=tf.uint8),
+                tf.TensorSpec(shape=(None, num_classes), dtype=tf.float32)
+            )
         )
+    
+    def _image_dataset(self, directory, shuffle, cache, cache_suffix, shard=None, img_size=IMG_SIZE):
+        """Unbatched dataset of (uint8 image, one-hot label) from a class-per-folder tree"""
+        # Same alphabetical class ordering as flow_from_directory
+        manifest, split = open_split(directory, quick=True)
+        class_names, samples = manifest.samples(split)
+        manifest.close()
+        paths = [str(path) for path, _ in samples]
+        labels = [label for _, label in samples]
         
-        return train_generator, val_generator
+        ds = tf.data.Dataset.from_tensor_slices((paths, labels))
+        if shuffle:
+            # Shuffle file order once up front so the cache is not class-sorted
+            ds = ds.shuffle(len(paths), seed=0, reshuffle_each_iteration=False)
+        if shard:
+            # Same seeded order on every worker, so the shards are disjoint
+            ds = ds.shard(shard[1], shard[0])
+        
+        num_classes = len(class_names)
+        
+        def load(path, label):
+            image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+            image = tf.image.resize(image, img_size)
+            image = tf.cast(tf.clip_by_value(image, 0, 255), tf.uint8)
+            return image, tf.one_hot(label, num_classes)
+        
+        ds = ds.map(load, num_parallel_calls=tf.data.AUTOTUNE)
+        ds = ds.apply(tf.data.experimental.ignore_errors())
+        if cache is True:
+            ds = ds.cache()
+        elif cache:
+            ds = ds.cache(f"{cache}_{cache_suffix}")
+        return ds
     
     def setup_directories(self):
         """Setup training directory structure"""
@@ -77,13 +193,77 @@ class DataLoader:
     
     def get_dataset_info(self, directory):
         """Get information about dataset"""
-        total_images = 0
-        class_counts = {}
+        manifest, split = open_split(directory, quick=True)
+        class_counts = manifest.counts(split)
+        manifest.close()
         
-        for class_dir in directory.iterdir():
-            if class_dir.is_dir():
-                count = len(list(class_dir.glob('*')))
-                class_counts[class_dir.name] = count
-                total_images += count
-        
-        return total_images, class_counts
\ No newline at end of file
+        return sum(class_counts.values()), class_counts
+
+
+class RandomShear(tf.keras.layers.Layer):
+    """Batch-wise random horizontal shear, angle given in degrees like ImageDataGenerator"""
+    def __init__(self, shear_range, fill_mode='nearest', **kwargs):
+        super().__init__(**kwargs)
+        self.shear_range = shear_range
+        self.fill_mode = fill_mode.upper()
+    
+    def call(self, images, training=None):
+        if not training or not self.shear_range:
+            return images
+        batch = tf.shape(images)[0]
+        height = tf.cast(tf.shape(images)[1], tf.float32)
+        angles = tf.random.uniform([batch], -self.shear_range, self.shear_range) * (np.pi / 180.0)
+        shear = tf.tan(angles)
+        ones, zeros = tf.ones([batch]), tf.zeros([batch])
+        # Shear about the image centre so content stays in frame
+        transforms = tf.stack([ones, shear, -shear * height / 2.0,
+                               zeros, ones, zeros, zeros, zeros], axis=1)
+        return tf.raw_ops.ImageProjectiveTransformV3(
+            images=images,
+            transforms=transforms,
+            output_shape=tf.shape(images)[1:3],
+            fill_value=0.0,
+            interpolation='BILINEAR',
+            fill_mode=self.fill_mode
+        )
+    
+    def get_config(self):
+        config = super().get_config()
+        config.update({'shear_range': self.shear_range, 'fill_mode': self.fill_mode.lower()})
+        return config
+
+
+class RandomBrightnessScale(tf.keras.layers.Layer):
+    """Batch-wise random brightness as a per-image factor, like ImageDataGenerator's brightness_range.
+    
+    Pixels are multiplied rather than offset, then clipped to 0-255.
+    """
+    def __init__(self, factor_range, **kwargs):
+        super().__init__(**kwargs)
+        self.factor_range = tuple(factor_range)
+    
+    def call(self, images, training=None):
+        if not training:
+            return images
+        factors = tf.random.uniform([tf.shape(images)[0], 1, 1, 1], *self.factor_range)
+        return tf.clip_by_value(images * factors, 0.0, 255.0)
+    
+    def get_config(self):
+        config = super().get_config()
+        config.update({'factor_range': list(self.factor_range)})
+        return config
+
+
+def build_augmentation():
+    """Vectorized augmentation equivalent to the ImageDataGenerator settings in constants.py"""
+    augmentation = []
+    if HORIZONTAL_FLIP:
+        augmentation.append(tf.keras.layers.RandomFlip('horizontal'))
+    augmentation += [
+        tf.keras.layers.RandomRotation(ROTATION_RANGE / 360.0, fill_mode='nearest'),
+        tf.keras.layers.RandomTranslation(HEIGHT_SHIFT_RANGE, WIDTH_SHIFT_RANGE, fill_mode='nearest'),
+        RandomShear(SHEAR_RANGE),
+        tf.keras.layers.RandomZoom(ZOOM_RANGE, fill_mode='nearest'),
+        RandomBrightnessScale(BRIGHTNESS_RANGE)
+    ]
+    return tf.keras.Sequential(augmentation, name='augmentation')
@@ -0,0 +1,164 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+from model import load_image
+from manifest import open_split
+from constants import *
+
+CACHE_VERSION = 2
+
+def list_split(split_dir):
+    """Return sorted class names and (path, label) pairs for a class-per-folder split"""
+    manifest, split = open_split(split_dir, quick=True)
+    try:
+        return manifest.samples(split)
+    finally:
+        manifest.close()
+
+def fingerprint(content_digest, img_size=IMG_SIZE):
+    """Cache key from the manifest's content digest of a split plus the target image size"""
+    return hashlib.sha1(f"v{CACHE_VERSION}:{img_size[0]}x{img_size[1]}:{content_digest}".encode()).hexdigest()
+
+class SplitCache:
+    """Decode-once uint8 image shards for one split, read back through memory maps.
+    
+    Images are stored at `img_size`; sizes other than IMG_SIZE get their own directory.
+    """
+    def __init__(self, split_dir, cache_dir=CACHE_DIR, shard_size=CACHE_SHARD_SIZE, img_size=IMG_SIZE):
+        self.split_dir = Path(split_dir)
+        self.img_size = tuple(img_size)
+        name = self.split_dir.name
+        if self.img_size != tuple(IMG_SIZE):
+            name += f"_{self.img_size[0]}x{self.img_size[1]}"
+        self.cache_path = Path(cache_dir) / name
+        self.shard_size = shard_size
+        self.index = None
+        self.images = []
+        self.labels = []
+
+    def is_fresh(self, digest):
+        index_file = self.cache_path / 'index.json'
+        if not index_file.exists():
+            return False
+        with open(index_file) as f:
+            return json.load(f).get('fingerprint') == digest
+
+    def build(self, force=False, workers=None):
+        """Write the split once as .npy shards; skipped when the cache is up to date"""
+        manifest, split = open_split(self.split_dir)
+        class_names, samples = manifest.samples(split)
+        digest = fingerprint(manifest.content_digest(split), self.img_size)
+        manifest.close()
+        if not force and self.is_fresh(digest):
+            print(f"Cache for {self.split_dir} is up to date")
+            return self.open()
+
+        print(f"📦 Caching {len(samples):,} images from {self.split_dir}...")
+        # Fixed shuffle so contiguous slices mix classes
+        samples = list(samples)
+        random.Random(0).shuffle(samples)
+
+        tmp_path = self.cache_path.with_name(self.cache_path.name + '.tmp')
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+
+        shards, skipped = [], 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for start in range(0, len(samples), self.shard_size):
+                chunk = samples[start:start + self.shard_size]
+                arrays = list(pool.map(partial(load_image, size=self.img_size), [str(p) for p, _ in chunk],
+                                       chunksize=32))
+                kept = [(a, label) for a, (_, label) in zip(arrays, chunk) if a is not None]
+                skipped += len(chunk) - len(kept)
+                if not kept:
+                    continue
+                name = f"shard_{len(shards):05d}"
+                np.save(tmp_path / f"{name}_images.npy", np.stack([a for a, _ in kept]))
+                np.save(tmp_path / f"{name}_labels.npy", np.array([l for _, l in kept], dtype=np.int32))
+                shards.append({'name': name, 'count': len(kept)})
+
+        with open(tmp_path / 'index.json', 'w') as f:
+            json.dump({
+                'fingerprint': digest,
+                'img_size': list(self.img_size),
+                'class_names': class_names,
+                'shards': shards
+            }, f, indent=2)
+
+        # Swap in the finished cache in one step
+        shutil.rmtree(self.cache_path, ignore_errors=True)
+        os.replace(tmp_path, self.cache_path)
+        print(f"✅ Cached {sum(s['count'] for s in shards):,} images in {len(shards)} shards, skipped {skipped:,}")
+        return self.open()
+
+    def open(self):
+        """Memory-map every shard read-only"""
+        with open(self.cache_path / 'index.json') as f:
+            self.index = json.load(f)
+        self.images = [np.load(self.cache_path / f"{s['name']}_images.npy", mmap_mode='r')
+                       for s in self.index['shards']]
+        self.labels = [np.load(self.cache_path / f"{s['name']}_labels.npy", mmap_mode='r')
+                       for s in self.index['shards']]
+        return self
+
+    @property
+    def class_names(self):
+        return self.index['class_names']
+
+    def __len__(self):
+        return sum(s['count'] for s in self.index['shards'])
+
+    def batch_slices(self, batch_size):
+        """(shard, start, stop) for every batch; batches never cross a shard boundary"""
+        slices = []
+        for shard, shard_info in enumerate(self.index['shards']):
+            for start in range(0, shard_info['count'], batch_size):
+                slices.append((shard, start, min(start + batch_size, shard_info['count'])))
+        return slices
+
+    def iter_batches(self, batch_size, shuffle=False, seed=None):
+        """Yield (uint8 images, int labels) batches.
+        
+        In order, batches are zero-copy views into the memory maps. With
+        shuffle, each shard is freshly permuted per seed, so batches are new
+        groupings every epoch; each one is gathered from its shard in sorted
+        index order to keep the reads moving forward through the file.
+        """
+        if not shuffle:
+            for shard, start, stop in self.batch_slices(batch_size):
+                yield self.images[shard][start:stop], self.labels[shard][start:stop]
+            return
+        
+        rng = np.random.default_rng(seed)
+        batches = []
+        for shard, shard_info in enumerate(self.index['shards']):
+            order = rng.permutation(shard_info['count'])
+            batches += [(shard, np.sort(order[start:start + batch_size]))
+                        for start in range(0, shard_info['count'], batch_size)]
+        for i in rng.permutation(len(batches)):
+            shard, indices = batches[i]
+            yield self.images[shard][indices], self.labels[shard][indices]
+
+def build_caches(data_dir='data', cache_dir=CACHE_DIR, force=False):
+    """Build (or validate) the train and val caches"""
+    return {
+        split: SplitCache(Path(data_dir) / split, cache_dir).build(force=force)
+        for split in ('train', 'val')
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decode data/train and data/val once into memory-mapped shards")
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--force', action='store_true', help="Rebuild even if the cache is up to date")
+    args = parser.parse_args()
+    build_caches(args.data_dir, args.cache_dir, args.force)
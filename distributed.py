@@ -0,0 +1,214 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from constants import *
+
+def cluster_info():
+    """(rank, number of workers) from TF_CONFIG; (0, 1) when not running multi-worker"""
+    config = json.loads(os.environ.get('TF_CONFIG') or '{}')
+    workers = len(config.get('cluster', {}).get('worker', [])) or 1
+    return config.get('task', {}).get('index', 0), workers
+
+def is_chief():
+    return cluster_info()[0] == 0
+
+def write_path(path):
+    """`path` on the chief; a throwaway per-worker location elsewhere.
+
+    Saving under MultiWorkerMirroredStrategy may aggregate variables across
+    workers, so every worker has to save, but only the chief's copy is kept.
+    """
+    if is_chief():
+        return path
+    scratch = Path(tempfile.gettempdir()) / f"catdog_worker_{cluster_info()[0]}"
+    scratch.mkdir(parents=True, exist_ok=True)
+    return str(scratch / Path(path).name)
+
+def get_strategy():
+    """MultiWorkerMirroredStrategy configured from TF_CONFIG; create it before building any model"""
+    from model import init_tensorflow
+
+    tf = init_tensorflow()
+    options = tf.distribute.experimental.CommunicationOptions(
+        implementation=tf.distribute.experimental.CommunicationImplementation.RING
+    )
+    return tf.distribute.MultiWorkerMirroredStrategy(communication_options=options)
+
+def barrier(strategy):
+    """Block until every worker reaches this point (a one-element all-reduce)"""
+    from model import init_tensorflow
+
+    tf = init_tensorflow()
+    strategy.reduce(tf.distribute.ReduceOp.SUM, strategy.run(lambda: tf.constant(1.0)), axis=None)
+
+def index_dataset(train_dir, val_dir):
+    """Bring the dataset manifest up to date once, before any worker reads it"""
+    from manifest import DatasetManifest
+
+    manifest = DatasetManifest(Path(train_dir).parent)
+    manifest.update(splits=(Path(train_dir).name, Path(val_dir).name))
+    manifest.close()
+
+def distributed_datasets(strategy, data_loader, train_dir, val_dir, per_worker_batch_size):
+    """Per-worker sharded tf.data inputs plus the steps every worker runs per epoch.
+
+    Returns (train, val, steps_per_epoch, validation_steps). The datasets repeat,
+    so all workers run exactly the same number of steps and never wait on a
+    worker whose shard ran out.
+    """
+    from manifest import open_split
+
+    global_batch_size = per_worker_batch_size * strategy.num_replicas_in_sync
+    # The chief indexes while the others wait, so they find an up-to-date
+    # manifest and only read it instead of all rescanning the same SQLite file
+    if is_chief():
+        index_dataset(train_dir, val_dir)
+    barrier(strategy)
+
+    def distribute(directory, training):
+        def dataset_fn(context):
+            return data_loader.create_sharded_dataset(
+                directory, training,
+                batch_size=context.get_per_replica_batch_size(global_batch_size),
+                shard=(context.input_pipeline_id, context.num_input_pipelines)
+            )
+        return strategy.distribute_datasets_from_function(dataset_fn)
+
+    def steps(directory):
+        manifest, split = open_split(directory, quick=True)
+        count = sum(manifest.counts(split).values())
+        manifest.close()
+        return max(count // global_batch_size, 1)
+
+    return distribute(train_dir, True), distribute(val_dir, False), steps(train_dir), steps(val_dir)
+
+def free_ports(count):
+    sockets = [socket.socket() for _ in range(count)]
+    for s in sockets:
+        s.bind(('localhost', 0))
+    ports = [s.getsockname()[1] for s in sockets]
+    for s in sockets:
+        s.close()
+    return ports
+
+def launch_local(command, workers, log_dir='logs'):
+    """Run `command` as `workers` processes on this machine, wired together through TF_CONFIG.
+
+    CPU threads are split evenly between the workers. The chief's output goes to
+    the console, the others' to log_dir/worker_<rank>.log. Returns the chief's output.
+    """
+    ports = free_ports(workers)
+    cluster = {'worker': [f"localhost:{port}" for port in ports]}
+    threads = str(max((os.cpu_count() or 1) // workers, 1))
+    Path(log_dir).mkdir(parents=True, exist_ok=True)
+
+    processes, logs = [], []
+    for rank in range(workers):
+        env = dict(os.environ,
+                   TF_CONFIG=json.dumps({'cluster': cluster, 'task': {'type': 'worker', 'index': rank}}),
+                   TF_NUM_INTRAOP_THREADS=threads, OMP_NUM_THREADS=threads)
+        if rank == 0:
+            stdout = subprocess.PIPE
+        else:
+            stdout = open(Path(log_dir) / f"worker_{rank}.log", 'w')
+            logs.append(stdout)
+        processes.append(subprocess.Popen(command, env=env, stdout=stdout, stderr=subprocess.STDOUT, text=True))
+
+    output = []
+    for line in processes[0].stdout:
+        print(line, end='')
+        output.append(line)
+    codes = [p.wait() for p in processes]
+    for log in logs:
+        log.close()
+    if any(codes):
+        raise RuntimeError(f"Worker exit codes {codes}; see {log_dir}/worker_*.log")
+    return ''.join(output)
+
+def run_benchmark_worker(steps, warmup_steps, per_worker_batch_size):
+    """Worker side of the scaling report: time training steps on synthetic data"""
+    import numpy as np
+    from model import CatDogClassifier, init_tensorflow
+
+    strategy = get_strategy()
+    tf = init_tensorflow()
+    classifier = CatDogClassifier()
+    with strategy.scope():
+        classifier.create_model(weights=None)
+
+    global_batch_size = per_worker_batch_size * strategy.num_replicas_in_sync
+    rng = np.random.default_rng(cluster_info()[0])
+
+    def dataset_fn(context):
+        batch_size = context.get_per_replica_batch_size(global_batch_size)
+        images = rng.integers(0, 256, (batch_size, *IMG_SIZE, 3), dtype=np.uint8)
+        labels = np.eye(len(CLASS_NAMES), dtype=np.float32)[rng.integers(0, len(CLASS_NAMES), batch_size)]
+        return tf.data.Dataset.from_tensors((images, labels)).repeat().prefetch(2)
+
+    dataset = strategy.distribute_datasets_from_function(dataset_fn)
+    classifier.model.fit(dataset, steps_per_epoch=warmup_steps, epochs=1, verbose=0)
+    start = time.perf_counter()
+    classifier.model.fit(dataset, steps_per_epoch=steps, epochs=1, verbose=0)
+    elapsed = time.perf_counter() - start
+    return {'images_per_sec': steps * global_batch_size / elapsed, 'workers': strategy.num_replicas_in_sync}
+
+def scaling_report(worker_counts=(1, 2, 4), steps=30, warmup_steps=5, per_worker_batch_size=BATCH_SIZE,
+                   output='scaling.json'):
+    """Throughput for each worker count and efficiency relative to one worker"""
+    results = []
+    for workers in worker_counts:
+        print(f"\n▶️ {workers} worker(s)")
+        command = [sys.executable, __file__, 'bench-worker', '--steps', str(steps),
+                   '--warmup-steps', str(warmup_steps), '--batch-size', str(per_worker_batch_size)]
+        result = json.loads(launch_local(command, workers).strip().splitlines()[-1])
+        results.append(result)
+
+    baseline = results[0]['images_per_sec'] / results[0]['workers']
+    for result in results:
+        result['speedup'] = result['images_per_sec'] / results[0]['images_per_sec']
+        result['efficiency'] = result['images_per_sec'] / (baseline * result['workers'])
+
+    print(f"\n{'workers':>8} {'images/sec':>12} {'speedup':>8} {'efficiency':>11}")
+    for r in results:
+        print(f"{r['workers']:>8} {r['images_per_sec']:>12.1f} {r['speedup']:>8.2f} {r['efficiency']:>10.0%}")
+    with open(output, 'w') as f:
+        json.dump({'per_worker_batch_size': per_worker_batch_size, 'steps': steps, 'results': results}, f, indent=2)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-worker data-parallel training on local processes")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    train = subparsers.add_parser('train', help="Run train_model.py --distributed as several local workers")
+    train.add_argument('--workers', type=int, default=2)
+    train.add_argument('args', nargs=argparse.REMAINDER, help="Extra arguments for train_model.py")
+
+    scaling = subparsers.add_parser('scaling', help="Measure throughput and scaling efficiency vs one worker")
+    scaling.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    scaling.add_argument('--steps', type=int, default=30)
+    scaling.add_argument('--warmup-steps', type=int, default=5)
+    scaling.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Per-worker batch size")
+    scaling.add_argument('-o', '--output', default='scaling.json')
+
+    bench = subparsers.add_parser('bench-worker', help=argparse.SUPPRESS)
+    bench.add_argument('--steps', type=int, default=30)
+    bench.add_argument('--warmup-steps', type=int, default=5)
+    bench.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    args = parser.parse_args()
+    if args.command == 'train':
+        index_dataset('data/train', 'data/val')
+        launch_local([sys.executable, 'train_model.py', '--distributed', *args.args], args.workers)
+    elif args.command == 'scaling':
+        scaling_report(args.workers, args.steps, args.warmup_steps, args.batch_size, args.output)
+    else:
+        result = run_benchmark_worker(args.steps, args.warmup_steps, args.batch_size)
+        if is_chief():
+            print(json.dumps(result))
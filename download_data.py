@@ -5,6 +5,11 @@ from pathlib import Path
 import shutil
 from PIL import Image
 import random
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from downloader import ParallelDownloader
+from manifest import DatasetManifest
+from constants import *
 
 def download_and_setup_massive_dataset():
     """Download and organize massive cat/dog dataset for 90%+ accuracy"""
@@ -33,17 +38,11 @@ def download_and_setup_massive_dataset():
     print("📁 Directory structure created")
     
     # Download Cats vs Dogs dataset (25,000 images)
-    cats_dogs_url = "https://download.microsoft.com/download/3/E/1/3E1C3F21-ECDB-4869-8368-6DEBA77B919F/kagglecatsanddogs_5340.zip"
-    
     print("🔄 Downloading massive Cats vs Dogs dataset...")
-    download_file(cats_dogs_url, data_dir / "cats_dogs.zip")
-    
-    # Extract and organize
-    print("📦 Extracting dataset...")
-    with zipfile.ZipFile(data_dir / "cats_dogs.zip", 'r') as zip_ref:
-        zip_ref.extractall(data_dir)
+    download_file(PET_IMAGES_URL, data_dir / "cats_dogs.zip", sha256=PET_IMAGES_SHA256)
     
-    # Organize images
+    # Extract only the sampled images straight from the archive
+    print("📦 Extracting selected images...")
     organize_cats_dogs_data(data_dir, dirs)
     
     # Add other class samples (random objects, people, etc.)
@@ -52,75 +51,88 @@ def download_and_setup_massive_dataset():
     print("✅ Massive dataset ready for 90%+ accuracy training!")
     print_dataset_stats(dirs)
 
-def download_file(url, filepath):
-    """Download file with progress"""
-    if filepath.exists():
-        print(f"File {filepath.name} already exists")
-        return
-    
-    response = requests.get(url, stream=True)
-    total_size = int(response.headers.get('content-length', 0))
-    
-    with open(filepath, 'wb') as f:
-        downloaded = 0
-        for chunk in response.iter_content(chunk_size=8192):
-            if chunk:
-                f.write(chunk)
-                downloaded += len(chunk)
-                if total_size > 0:
-                    percent = (downloaded / total_size) * 100
-                    print(f"\rDownloading: {percent:.1f}%", end='', flush=True)
-    print()
+def download_file(url, filepath, sha256=None):
+    """Download file with parallel ranges, resume and integrity checks"""
+    ParallelDownloader().download(url, filepath, sha256=sha256)
 
-def organize_cats_dogs_data(data_dir, dirs):
-    """Organize cats and dogs into train/val splits - FAST VERSION"""
+def organize_cats_dogs_data(data_dir, dirs, limit=IMAGES_PER_CLASS):
+    """Organize cats and dogs into train/val splits - FAST VERSION
     
+    Reads the sample straight out of cats_dogs.zip when present, otherwise
+    links images from an already extracted PetImages directory.
+    """
+    zip_path = data_dir / "cats_dogs.zip"
     source_dir = data_dir / "PetImages"
     
-    if not source_dir.exists():
-        print("⚠️ PetImages directory not found")
+    if zip_path.exists():
+        with zipfile.ZipFile(zip_path) as zip_ref:
+            # Pick the sample from the central directory, skipping empty entries
+            members = [info.filename for info in zip_ref.infolist()
+                       if info.filename.lower().endswith('.jpg') and info.file_size > 0]
+        sources = {
+            'cat': sorted(m for m in members if m.startswith('PetImages/Cat/')),
+            'dog': sorted(m for m in members if m.startswith('PetImages/Dog/'))
+        }
+    elif source_dir.exists():
+        zip_path = None
+        sources = {
+            'cat': sorted((source_dir / "Cat").glob("*.jpg")),
+            'dog': sorted((source_dir / "Dog").glob("*.jpg"))
+        }
+    else:
+        print("⚠️ Neither cats_dogs.zip nor PetImages directory found")
         return
     
-    # Process cats - LIMIT TO 2000 for speed
-    cat_source = source_dir / "Cat"
-    if cat_source.exists():
-        images = list(cat_source.glob("*.jpg"))[:2000]
+    for class_name, images in sources.items():
+        images = images[:limit]
         random.shuffle(images)
         
         split_idx = int(len(images) * 0.8)
-        train_cats = images[:split_idx]
-        val_cats = images[split_idx:]
-        
-        copy_images(train_cats, dirs['train']['cat'])
-        copy_images(val_cats, dirs['val']['cat'])
-    
-    # Process dogs - LIMIT TO 2000 for speed
-    dog_source = source_dir / "Dog"
-    if dog_source.exists():
-        images = list(dog_source.glob("*.jpg"))[:2000]
-        random.shuffle(images)
-        
-        split_idx = int(len(images) * 0.8)
-        train_dogs = images[:split_idx]
-        val_dogs = images[split_idx:]
-        
-        copy_images(train_dogs, dirs['train']['dog'])
-        copy_images(val_dogs, dirs['val']['dog'])
+        copy_images(images[:split_idx], dirs['train'][class_name], zip_path)
+        copy_images(images[split_idx:], dirs['val'][class_name], zip_path)
 
-def copy_images(image_list, dest_dir):
-    """Copy and validate images"""
-    for i, img_path in enumerate(image_list):
-        try:
-            # Validate image
-            with Image.open(img_path) as img:
+_worker_zip = None
+
+def _open_zip(zip_path):
+    """Process pool initializer: each worker parses the central directory once"""
+    global _worker_zip
+    _worker_zip = zipfile.ZipFile(zip_path) if zip_path else None
+
+def _place_image(job):
+    """Validate one image and place it at its destination; returns the source on failure"""
+    source, dest_path = job
+    try:
+        if _worker_zip is not None:
+            data = _worker_zip.read(source)
+            with Image.open(BytesIO(data)) as img:
                 img.verify()
-            
-            # Copy to destination
-            dest_path = dest_dir / f"{i:05d}.jpg"
-            shutil.copy2(img_path, dest_path)
-            
-        except Exception as e:
-            print(f"Skipping corrupted image: {img_path}")
+            with open(dest_path, 'wb') as f:
+                f.write(data)
+        else:
+            with Image.open(source) as img:
+                img.verify()
+            try:
+                os.link(source, dest_path)
+            except OSError:
+                # Cross-device or unsupported filesystem
+                shutil.copy2(source, dest_path)
+        return None
+    except Exception:
+        return str(source)
+
+def copy_images(image_list, dest_dir, zip_path=None):
+    """Validate and place images in parallel, from zip members or files on disk"""
+    jobs = []
+    for i, source in enumerate(image_list):
+        dest_path = dest_dir / f"{i:05d}.jpg"
+        if dest_path.exists():
+            dest_path.unlink()
+        jobs.append((source, dest_path))
+    
+    with ProcessPoolExecutor(initializer=_open_zip, initargs=(zip_path,)) as pool:
+        for failed in pool.map(_place_image, jobs, chunksize=32):
+            if failed:
+                print(f"Skipping corrupted image: {failed}")
 
 def create_other_class_samples(dirs):
     """Create 'other' class with diverse samples - FAST VERSION"""
@@ -146,19 +158,26 @@ def create_other_class_samples(dirs):
             continue
 
 def print_dataset_stats(dirs):
-    """Print dataset statistics"""
+    """Print dataset statistics from the manifest, plus duplicate and train/val leakage checks"""
     print("\n📊 Dataset Statistics:")
     
-    for split_name, split_dirs in dirs.items():
+    data_dir = Path(next(iter(dirs['train'].values()))).parent.parent
+    manifest = DatasetManifest(data_dir)
+    manifest.update(splits=tuple(dirs))
+    
+    for split_name in dirs:
         print(f"\n{split_name.upper()} SET:")
-        total = 0
-        
-        for class_name, class_dir in split_dirs.items():
-            count = len(list(class_dir.glob("*.jpg")))
-            total += count
+        counts = manifest.counts(split_name)
+        for class_name, count in counts.items():
             print(f"  {class_name}: {count:,} images")
         
-        print(f"  Total: {total:,} images")
+        print(f"  Total: {sum(counts.values()):,} images")
+    
+    duplicates = manifest.duplicates()
+    leaks = manifest.leakage()
+    print(f"\n🔁 {len(duplicates):,} groups of exact duplicates, "
+          f"{len(leaks):,} validation images also in training")
+    manifest.close()
 
 if __name__ == "__main__":
     download_and_setup_massive_dataset()
\ No newline at end of file
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from constants import *
+
+def file_sha256(path, block_size=1024 * 1024):
+    """SHA-256 of a file, read in large blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def verify_file(path, size=None, sha256=None):
+    """True if the file exists and matches the expected size and hash (when given)"""
+    path = Path(path)
+    if not path.exists():
+        return False
+    if size is not None and path.stat().st_size != size:
+        return False
+    if sha256 is not None and file_sha256(path) != sha256.lower():
+        return False
+    return True
+
+class ParallelDownloader:
+    """Byte-range parallel downloader that resumes from a .part file and verifies the result.
+
+    Progress is tracked in `<dest>.part.json` so an interrupted run continues with
+    only the missing ranges. The final file only appears once size and hash check out.
+    """
+    def __init__(self, workers=DOWNLOAD_WORKERS, chunk_size=DOWNLOAD_CHUNK_SIZE,
+                 mirror_dir=DOWNLOAD_MIRROR_DIR, retries=5, timeout=(10, 60), session=None):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.mirror_dir = Path(mirror_dir) if mirror_dir else None
+        self.retries = retries
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._lock = threading.Lock()
+
+    def download(self, url, dest, sha256=None, size=None):
+        """Fetch `url` to `dest` unless a verified copy is already there; returns the path"""
+        dest = Path(dest)
+        # Without a size or hash to check, an existing file may be a truncated
+        # leftover, so it is only trusted once it matches the remote size below
+        if (size is not None or sha256 is not None) and verify_file(dest, size, sha256):
+            print(f"File {dest.name} already exists")
+            return dest
+
+        if self._copy_from_mirror(dest, sha256, size):
+            return dest
+
+        head = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+        head.raise_for_status()
+        remote_size = int(head.headers.get('content-length', 0)) or None
+        if size is not None and remote_size is not None and remote_size != size:
+            raise IOError(f"Remote size {remote_size} does not match expected {size} for {url}")
+        size = size or remote_size
+        if size is not None and verify_file(dest, size, sha256):
+            print(f"File {dest.name} already exists")
+            return dest
+        validator = head.headers.get('etag') or head.headers.get('last-modified')
+
+        part = dest.with_name(dest.name + '.part')
+        if size and head.headers.get('accept-ranges', '').lower() == 'bytes':
+            self._download_ranges(head.url, part, size, validator)
+        else:
+            self._download_stream(head.url, part)
+
+        if not verify_file(part, size, sha256):
+            part.unlink(missing_ok=True)
+            self._state_path(part).unlink(missing_ok=True)
+            raise IOError(f"Integrity check failed for {dest.name}, partial download removed")
+
+        os.replace(part, dest)
+        self._state_path(part).unlink(missing_ok=True)
+        print(f"✅ Downloaded and verified {dest.name}")
+        return dest
+
+    def _copy_from_mirror(self, dest, sha256, size):
+        if not self.mirror_dir:
+            return False
+        source = self.mirror_dir / dest.name
+        if not verify_file(source, size, sha256):
+            return False
+        print(f"Using mirror copy {source}")
+        tmp = dest.with_name(dest.name + '.mirror')
+        shutil.copyfile(source, tmp)
+        os.replace(tmp, dest)
+        return True
+
+    def _state_path(self, part):
+        return part.with_name(part.name + '.json')
+
+    def _load_state(self, part, url, size, validator):
+        state_path = self._state_path(part)
+        if part.exists() and state_path.exists():
+            with open(state_path) as f:
+                state = json.load(f)
+            # Only resume if the remote file and chunking are unchanged
+            if (state.get('size') == size and state.get('validator') == validator
+                    and state.get('chunk_size') == self.chunk_size):
+                return state
+        state = {'url': url, 'size': size, 'validator': validator,
+                 'chunk_size': self.chunk_size, 'done': []}
+        with open(part, 'wb') as f:
+            f.truncate(size)
+        self._save_state(part, state)
+        return state
+
+    def _save_state(self, part, state):
+        state_path = self._state_path(part)
+        tmp = state_path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, state_path)
+
+    def _download_ranges(self, url, part, size, validator):
+        state = self._load_state(part, url, size, validator)
+        done = set(state['done'])
+        chunks = [i for i in range((size + self.chunk_size - 1) // self.chunk_size) if i not in done]
+        if done:
+            print(f"Resuming {part.name}: {len(done)} chunks already downloaded")
+
+        progress = {'bytes': len(done) * self.chunk_size}
+        fd = os.open(part, os.O_WRONLY)
+        try:
+            def fetch(index):
+                start = index * self.chunk_size
+                end = min(start + self.chunk_size, size) - 1
+                data = self._get_range(url, start, end)
+                os.pwrite(fd, data, start)
+                with self._lock:
+                    done.add(index)
+                    state['done'] = sorted(done)
+                    self._save_state(part, state)
+                    progress['bytes'] = min(progress['bytes'] + len(data), size)
+                    print(f"\rDownloading: {progress['bytes'] / size * 100:.1f}%", end='', flush=True)
+
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                list(pool.map(fetch, chunks))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        print()
+
+    def _get_range(self, url, start, end):
+        expected = end - start + 1
+        last_error = None
+        for _ in range(self.retries):
+            try:
+                response = self.session.get(url, headers={'Range': f'bytes={start}-{end}'},
+                                            timeout=self.timeout)
+                response.raise_for_status()
+                if response.status_code == 206 and len(response.content) == expected:
+                    return response.content
+                last_error = IOError(f"Bad range response for bytes {start}-{end}")
+            except requests.RequestException as e:
+                last_error = e
+        raise IOError(f"Failed to download bytes {start}-{end}: {last_error}")
+
+    def _download_stream(self, url, part):
+        """Fallback for servers without range support: a single sequential stream"""
+        response = self.session.get(url, stream=True, timeout=self.timeout)
+        response.raise_for_status()
+        with open(part, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                f.write(chunk)
+
+def download(url, dest, sha256=None, size=None, **kwargs):
+    """Convenience wrapper around ParallelDownloader.download"""
+    return ParallelDownloader(**kwargs).download(url, dest, sha256=sha256, size=size)
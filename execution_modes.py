@@ -0,0 +1,75 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from model import CatDogClassifier, cpu_supports_bf16, init_tensorflow
+from constants import *
+
+def build_classifier(mode, weights):
+    """Classifier in `mode` carrying exactly the given weights"""
+    classifier = CatDogClassifier()
+    classifier.set_execution_mode(mode)
+    classifier.create_model(weights=None)
+    classifier.model.set_weights(weights)
+    return classifier
+
+def inference_throughput(classifier, batch, seconds=3.0):
+    classifier.predict_batch(batch)  # trace / compile
+    count, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        classifier.predict_batch(batch)
+        count += len(batch)
+    return count / (time.perf_counter() - start)
+
+def training_throughput(classifier, images, labels, steps=20, warmup_steps=3):
+    tf = init_tensorflow()
+    dataset = tf.data.Dataset.from_tensors((images, labels)).repeat()
+    classifier.model.fit(dataset, steps_per_epoch=warmup_steps, epochs=1, verbose=0)
+    start = time.perf_counter()
+    classifier.model.fit(dataset, steps_per_epoch=steps, epochs=1, verbose=0)
+    return steps / (time.perf_counter() - start)
+
+def compare_modes(modes=EXECUTION_MODES, model_path=None, batch_size=32, output='execution_modes.json'):
+    """Parity against float32 eager predictions plus inference/training throughput per mode"""
+    tf = init_tensorflow()
+    rng = np.random.default_rng(0)
+    batch = rng.integers(0, 256, (batch_size, *IMG_SIZE, 3), dtype=np.uint8)
+    labels = np.eye(len(CLASS_NAMES), dtype=np.float32)[rng.integers(0, len(CLASS_NAMES), batch_size)]
+
+    reference = CatDogClassifier()
+    if model_path:
+        reference.load_model(model_path)
+    else:
+        tf.keras.utils.set_random_seed(0)
+        reference.create_model(weights=None)
+    weights = reference.model.get_weights()
+    reference_probs = reference.predict_batch(batch)
+
+    results = {'meta': {'cpu_supports_bf16': cpu_supports_bf16(), 'batch_size': batch_size}}
+    for mode in modes:
+        classifier = build_classifier(mode, weights)
+        probs = classifier.predict_batch(batch).astype(np.float32)
+        results[mode] = {
+            'max_abs_diff': float(np.max(np.abs(probs - reference_probs))),
+            'top1_agreement': float(np.mean(np.argmax(probs, 1) == np.argmax(reference_probs, 1))),
+            'policy': tf.keras.mixed_precision.global_policy().name,
+            'inference_images_per_sec': inference_throughput(classifier, batch),
+            'training_steps_per_sec': training_throughput(classifier, batch, labels)
+        }
+        print(f"{mode:>9}: {results[mode]}")
+
+    tf.keras.mixed_precision.set_global_policy('float32')
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parity and throughput of eager / XLA / bfloat16 execution modes")
+    parser.add_argument('--modes', nargs='+', default=EXECUTION_MODES, choices=EXECUTION_MODES)
+    parser.add_argument('--model', help="Compare using trained weights from this file (default: random weights)")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('-o', '--output', default='execution_modes.json')
+    args = parser.parse_args()
+    compare_modes(args.modes, args.model, args.batch_size, args.output)
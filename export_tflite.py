@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from dataset_cache import list_split
+from model import CatDogClassifier, load_image
+from constants import *
+
+def load_val_samples(val_dir, limit):
+    """Up to `limit` (uint8 images, labels) from the validation split, evenly shuffled"""
+    class_names, samples = list_split(val_dir)
+    rng = np.random.default_rng(0)
+    order = rng.permutation(len(samples))[:limit]
+    images, labels = [], []
+    for i in order:
+        path, label = samples[i]
+        array = load_image(str(path))
+        if array is not None:
+            images.append(array)
+            labels.append(label)
+    return np.stack(images), np.array(labels)
+
+def convert(model, mode, calibration_images=None):
+    """Convert a Keras model to TFLite: fp32, fp16 or int8 post-training quantization"""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if mode == 'tflite-fp16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif mode == 'tflite-int8':
+        def representative_dataset():
+            for image in calibration_images:
+                yield [image[np.newaxis].astype(np.float32)]
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        # Float in/out keeps the predict API unchanged; the graph itself runs int8.
+        # Inputs are raw 0-255 pixels since rescaling is part of the model.
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    return converter.convert()
+
+def evaluate_backend(classifier, images, labels, latency_runs=50):
+    """Accuracy on the given samples plus single-image latency percentiles in ms"""
+    probabilities = np.concatenate([
+        classifier.predict_batch(images[i:i + 32]) for i in range(0, len(images), 32)
+    ])
+    accuracy = float(np.mean(np.argmax(probabilities, axis=1) == labels))
+
+    classifier.warm_up()
+    timings = []
+    for i in range(latency_runs):
+        start = time.perf_counter()
+        classifier.predict_batch(images[i % len(images)][np.newaxis])
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'accuracy': accuracy,
+        'latency_ms_p50': float(np.percentile(timings, 50)),
+        'latency_ms_p95': float(np.percentile(timings, 95))
+    }
+
+def export(model_path=MODEL_PATH, val_dir='data/val', calibration_size=200, eval_size=1000,
+           report_path='tflite_report.json'):
+    """Export the SavedModel and every TFLite variant and write an accuracy-delta and latency report"""
+    keras_classifier = CatDogClassifier()
+    # An untrained stand-in must never overwrite the exported artifacts
+    keras_classifier.load_model(model_path, fallback=False)
+
+    print(f"Loading validation samples from {val_dir}...")
+    images, labels = load_val_samples(val_dir, max(calibration_size, eval_size))
+    calibration_images = images[:calibration_size]
+
+    report = {'keras': evaluate_backend(keras_classifier, images[:eval_size], labels[:eval_size])}
+
+    print(f"🔄 Exporting SavedModel to {SAVEDMODEL_PATH}...")
+    keras_classifier.export_saved_model(SAVEDMODEL_PATH)
+    classifier = CatDogClassifier()
+    classifier.load_model(SAVEDMODEL_PATH, backend='savedmodel')
+    report['savedmodel'] = evaluate_backend(classifier, images[:eval_size], labels[:eval_size])
+    report['savedmodel']['accuracy_delta'] = report['savedmodel']['accuracy'] - report['keras']['accuracy']
+
+    for backend, path in TFLITE_PATHS.items():
+        print(f"🔄 Converting to {backend}...")
+        with open(path, 'wb') as f:
+            f.write(convert(keras_classifier.model, backend, calibration_images))
+
+        classifier = CatDogClassifier()
+        classifier.load_model(path, backend=backend)
+        result = evaluate_backend(classifier, images[:eval_size], labels[:eval_size])
+        result['accuracy_delta'] = result['accuracy'] - report['keras']['accuracy']
+        result['size_mb'] = os.path.getsize(path) / 1e6
+        report[backend] = result
+
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print("\n📊 Backend report:")
+    for backend, result in report.items():
+        delta = result.get('accuracy_delta', 0.0)
+        print(f"  {backend:>12}: accuracy {result['accuracy']:.4f} ({delta:+.4f}), "
+              f"p50 {result['latency_ms_p50']:.2f} ms, p95 {result['latency_ms_p95']:.2f} ms")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the trained model to a SavedModel and quantized TFLite and compare backends")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--val-dir', default='data/val')
+    parser.add_argument('--calibration-size', type=int, default=200)
+    parser.add_argument('--eval-size', type=int, default=1000)
+    parser.add_argument('--report', default='tflite_report.json')
+    args = parser.parse_args()
+    export(args.model, args.val_dir, args.calibration_size, args.eval_size, args.report)
@@ -0,0 +1,61 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from dataset_cache import SplitCache
+from constants import *
+
+class FeatureCache:
+    """Pooled backbone embeddings for one split, computed once and stored on disk.
+    
+    `img_size` must be the input size of the classifier the features are built with.
+    """
+    def __init__(self, split_dir, cache_dir=CACHE_DIR, img_size=IMG_SIZE):
+        self.split_cache = SplitCache(split_dir, cache_dir, img_size=img_size)
+        self.path = Path(cache_dir) / f"features_{self.split_cache.cache_path.name}"
+
+    def _key(self, classifier):
+        # Embeddings depend on the decoded images and on the classifier's frozen backbone
+        width, height = classifier.img_size
+        return f"{self.split_cache.index['fingerprint']}:{classifier.base_model}:{classifier.alpha}:{width}x{height}"
+
+    def load_or_build(self, classifier, batch_size=BATCH_SIZE):
+        """Return (features, one-hot labels), running the backbone only if the cache is stale"""
+        if tuple(classifier.img_size) != self.split_cache.img_size:
+            raise ValueError(f"Classifier input size {tuple(classifier.img_size)} does not match the "
+                             f"{self.split_cache.img_size} images of this FeatureCache")
+        self.split_cache.build()
+        meta_file = self.path / 'meta.json'
+        if meta_file.exists():
+            with open(meta_file) as f:
+                if json.load(f).get('key') == self._key(classifier):
+                    return self._load()
+
+        print(f"🧠 Extracting {classifier.base_model} features for {len(self.split_cache):,} images...")
+        extractor = classifier.feature_extractor()
+        features, labels = [], []
+        for images, batch_labels in self.split_cache.iter_batches(batch_size):
+            features.append(extractor.predict(np.asarray(images), batch_size=len(images), verbose=0))
+            labels.append(np.asarray(batch_labels))
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        np.save(self.path / 'features.npy', np.concatenate(features).astype(np.float32))
+        np.save(self.path / 'labels.npy', np.concatenate(labels))
+        tmp = meta_file.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'key': self._key(classifier), 'class_names': self.split_cache.class_names}, f)
+        os.replace(tmp, meta_file)
+        return self._load()
+
+    def _load(self):
+        features = np.load(self.path / 'features.npy', mmap_mode='r')
+        labels = np.load(self.path / 'labels.npy')
+        return features, np.eye(len(self.split_cache.class_names), dtype=np.float32)[labels]
+
+def load_features(classifier, train_dir, val_dir, cache_dir=CACHE_DIR):
+    """Cached (train_features, train_labels, val_features, val_labels)"""
+    train_x, train_y = FeatureCache(train_dir, cache_dir, classifier.img_size).load_or_build(classifier)
+    val_x, val_y = FeatureCache(val_dir, cache_dir, classifier.img_size).load_or_build(classifier)
+    return train_x, train_y, val_x, val_y
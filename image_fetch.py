@@ -0,0 +1,126 @@
+import socket
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image
+
+from metrics import METRICS
+from constants import *
+
+# Refuse anything PIL itself would treat as a decompression bomb
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+FetchResult = namedtuple('FetchResult', ['url', 'image', 'error', 'data', 'validator'])
+
+class ImageFetchError(Exception):
+    """Raised when a URL cannot be fetched or decoded within the configured limits"""
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Process-wide pooled session so repeated fetches reuse connections"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=FETCH_WORKERS, pool_maxsize=FETCH_WORKERS)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['Accept'] = 'image/*'
+            _session = session
+    return _session
+
+def _abort_after(connection, seconds):
+    """Started timer that shuts down the connection's socket after `seconds`.
+
+    The read timeout only bounds each wait for the next bytes, so a server
+    that trickles data can keep a read going indefinitely; shutting the socket
+    down wakes the blocked read with an end of stream.
+    """
+    def abort():
+        sock = getattr(connection, 'sock', None)
+        if sock is not None:
+            try:
+                # At the OS level, so TLS sockets are cut off too
+                socket.socket.shutdown(sock, socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    timer = threading.Timer(max(seconds, 0.0), abort)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+def fetch_bytes(url, max_bytes=MAX_IMAGE_BYTES, timeout=(FETCH_CONNECT_TIMEOUT, FETCH_READ_TIMEOUT),
+                deadline=FETCH_TOTAL_TIMEOUT):
+    """Stream a URL's body, giving up past `max_bytes` or `deadline` seconds in total.
+    
+    Returns (body, validator) where validator is the ETag or Last-Modified header, if any.
+    """
+    start = time.monotonic()
+    try:
+        with METRICS.time('fetch'), get_session().get(url, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            declared = int(response.headers.get('content-length') or 0)
+            if declared > max_bytes:
+                raise ImageFetchError(f"Image is {declared:,} bytes, limit is {max_bytes:,}")
+
+            body = bytearray()
+            watchdog = _abort_after(response.raw.connection, deadline - (time.monotonic() - start))
+            try:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    body.extend(chunk)
+                    if len(body) > max_bytes:
+                        raise ImageFetchError(f"Image exceeds {max_bytes:,} bytes")
+                    if time.monotonic() - start > deadline:
+                        break
+            except requests.RequestException:
+                if time.monotonic() - start <= deadline:
+                    raise
+            finally:
+                watchdog.cancel()
+            # Also catches a body cut short by the watchdog, which may end without an error
+            if time.monotonic() - start > deadline:
+                raise ImageFetchError(f"Download took longer than {deadline}s")
+            validator = response.headers.get('etag') or response.headers.get('last-modified')
+            return bytes(body), validator
+    except requests.RequestException as e:
+        raise ImageFetchError(f"Request failed: {e}") from e
+
+def decode_image(data, max_pixels=MAX_IMAGE_PIXELS):
+    """Decode image bytes, checking the pixel count from the header before the full decode"""
+    try:
+        image = Image.open(BytesIO(data))
+        width, height = image.size
+        if width * height > max_pixels:
+            raise ImageFetchError(f"Image is {width}x{height}, limit is {max_pixels:,} pixels")
+        with METRICS.time('decode'):
+            image.load()
+        return image
+    except ImageFetchError:
+        raise
+    except Exception as e:
+        raise ImageFetchError(f"Not a valid image: {e}") from e
+
+def fetch_image(url):
+    """Fetch and decode one image URL, raising ImageFetchError on any failure"""
+    data, _ = fetch_bytes(url)
+    return decode_image(data)
+
+def fetch_images(urls, workers=FETCH_WORKERS):
+    """Fetch several URLs concurrently; returns a FetchResult per URL, in order"""
+    def fetch(url):
+        try:
+            data, validator = fetch_bytes(url)
+            return FetchResult(url, decode_image(data), None, data, validator)
+        except ImageFetchError as e:
+            return FetchResult(url, None, str(e), None, None)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(urls)))) as pool:
+        return list(pool.map(fetch, urls))
@@ -0,0 +1,98 @@
+import argparse
+import http.client
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from constants import *
+
+def load_payloads(image_dir=None, count=32, seed=0):
+    """JPEG bodies to send: files from `image_dir`, or synthetic images if none given"""
+    if image_dir:
+        paths = sorted(p for p in Path(image_dir).rglob('*') if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+        return [p.read_bytes() for p in paths[:count]]
+
+    rng = np.random.default_rng(seed)
+    payloads = []
+    for _ in range(count):
+        buffer = BytesIO()
+        Image.fromarray(rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)).save(buffer, 'JPEG', quality=85)
+        payloads.append(buffer.getvalue())
+    return payloads
+
+def run_load_test(host=SERVE_HOST, port=SERVE_PORT, concurrency=16, requests_per_client=50, image_dir=None,
+                  repeat_payloads=False):
+    """Closed-loop load test: each client sends its next request as soon as the last one returns.
+
+    Every request body is unique unless `repeat_payloads` is set, so the
+    server's prediction cache cannot answer it and each one reaches the model.
+    """
+    payloads = load_payloads(image_dir)
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+
+    def client(client_id):
+        connection = http.client.HTTPConnection(host, port, timeout=30)
+        for i in range(requests_per_client):
+            body = payloads[(client_id + i) % len(payloads)]
+            if not repeat_payloads:
+                # Decoders stop at the end-of-image marker, so a trailer changes the cache key but not the image
+                body += f"{client_id}:{i}".encode()
+            start = time.perf_counter()
+            try:
+                connection.request('POST', '/predict', body, {'Content-Type': 'application/octet-stream'})
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                ok = False
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=30)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+        connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    duration = time.perf_counter() - start
+
+    connection = http.client.HTTPConnection(host, port, timeout=10)
+    connection.request('GET', '/stats')
+    stats = json.loads(connection.getresponse().read())
+    connection.close()
+
+    results = {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput_rps': len(latencies) / duration,
+        'latency_ms_p50': float(np.percentile(latencies, 50)) if latencies else None,
+        'latency_ms_p95': float(np.percentile(latencies, 95)) if latencies else None,
+        'latency_ms_p99': float(np.percentile(latencies, 99)) if latencies else None,
+        'server_mean_batch_size': stats['mean_batch_size']
+    }
+    print(json.dumps(results, indent=2))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the micro-batching inference service")
+    parser.add_argument('--host', default=SERVE_HOST)
+    parser.add_argument('--port', type=int, default=SERVE_PORT)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=50, help="Requests per client")
+    parser.add_argument('--image-dir', help="Send these images instead of synthetic ones")
+    parser.add_argument('--repeat-payloads', action='store_true',
+                        help="Resend the same 32 bodies, so most requests are prediction cache hits")
+    args = parser.parse_args()
+    run_load_test(args.host, args.port, args.concurrency, args.requests, args.image_dir, args.repeat_payloads)
@@ -0,0 +1,249 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+from constants import *
+from model import IMAGE_EXTENSIONS
+
+def describe_image(path):
+    """(sha256, width, height) for one file; dimensions are None if it cannot be decoded"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    try:
+        # Only the header is parsed here, not the pixels
+        with Image.open(path) as image:
+            width, height = image.size
+    except Exception:
+        width = height = None
+    return digest.hexdigest(), width, height
+
+class DatasetManifest:
+    """SQLite record of every image under a data directory laid out as split/class/file.
+
+    Every update stats each file and re-hashes those whose size or mtime
+    changed, so cache fingerprints built from content_digest() follow in-place
+    rewrites. `quick=True` instead skips class directories whose mtime is
+    unchanged: enough to keep file lists right (adding, removing or renaming a
+    file changes it), but blind to files rewritten in place, so only use it for
+    listing. Paths are stored relative to the data directory.
+    """
+    def __init__(self, data_dir='data', db_path=None):
+        self.data_dir = Path(data_dir)
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        # Several processes (training workers, the app) may open the same file
+        self.db = sqlite3.connect(db_path or self.data_dir / MANIFEST_FILENAME, timeout=MANIFEST_LOCK_TIMEOUT)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS images ('
+            'path TEXT PRIMARY KEY, split TEXT NOT NULL, class TEXT NOT NULL, size INTEGER NOT NULL, '
+            'mtime_ns INTEGER NOT NULL, width INTEGER, height INTEGER, sha256 TEXT NOT NULL)'
+        )
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS class_dirs ('
+            'split TEXT NOT NULL, class TEXT NOT NULL, mtime_ns INTEGER NOT NULL, PRIMARY KEY (split, class))'
+        )
+        self.db.execute('CREATE INDEX IF NOT EXISTS images_split_class ON images (split, class, path)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS images_sha256 ON images (sha256, split)')
+        self.db.commit()
+
+    def update(self, splits=('train', 'val'), quick=False, workers=None, commit_every=1000):
+        """Bring the manifest in line with the files on disk; returns (added or changed, removed).
+
+        Changes are committed per class directory and every `commit_every`
+        described images, so no write lock is held for the whole run, and an
+        up-to-date manifest is not written to at all.
+        """
+        changed, removed, dir_mtimes = [], 0, []
+        for split in splits:
+            split_dir = self.data_dir / split
+            on_disk = {}
+            if split_dir.is_dir():
+                with os.scandir(split_dir) as entries:
+                    on_disk = {e.name: e.stat().st_mtime_ns for e in entries if e.is_dir()}
+            known = dict(self.db.execute('SELECT class, mtime_ns FROM class_dirs WHERE split = ?', (split,)))
+
+            for class_name in known.keys() - on_disk.keys():
+                removed += self.db.execute('DELETE FROM images WHERE split = ? AND class = ?',
+                                           (split, class_name)).rowcount
+                self.db.execute('DELETE FROM class_dirs WHERE split = ? AND class = ?', (split, class_name))
+                self.db.commit()
+
+            for class_name, dir_mtime in on_disk.items():
+                if quick and known.get(class_name) == dir_mtime:
+                    continue
+                stale, removed_here = self._scan_class_dir(split, class_name)
+                changed += stale
+                removed += removed_here
+                if known.get(class_name) != dir_mtime:
+                    # mtime taken before the listing, so changes made during the scan trigger another one
+                    dir_mtimes.append((split, class_name, dir_mtime))
+                self.db.commit()
+
+        if changed:
+            print(f"🗂️ Indexing {len(changed):,} new or changed images...")
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                paths = [str(self.data_dir / row[0]) for row in changed]
+                for i, (row, info) in enumerate(zip(changed, pool.map(describe_image, paths, chunksize=64)), 1):
+                    self.db.execute('INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                    (*row, info[1], info[2], info[0]))
+                    if i % commit_every == 0:
+                        self.db.commit()
+        # Recorded last, so an interrupted run rescans these directories next time
+        if dir_mtimes:
+            self.db.executemany('INSERT OR REPLACE INTO class_dirs VALUES (?, ?, ?)', dir_mtimes)
+        self.db.commit()
+        return len(changed), removed
+
+    def _scan_class_dir(self, split, class_name):
+        """Rows to (re)describe in one class directory, and the number of rows dropped"""
+        known = {path: (size, mtime) for path, size, mtime in self.db.execute(
+            'SELECT path, size, mtime_ns FROM images WHERE split = ? AND class = ?', (split, class_name))}
+        changed, seen = [], set()
+        with os.scandir(self.data_dir / split / class_name) as entries:
+            for entry in entries:
+                if not entry.is_file() or Path(entry.name).suffix.lower() not in IMAGE_EXTENSIONS:
+                    continue
+                path = f"{split}/{class_name}/{entry.name}"
+                stat = entry.stat()
+                seen.add(path)
+                if known.get(path) != (stat.st_size, stat.st_mtime_ns):
+                    changed.append((path, split, class_name, stat.st_size, stat.st_mtime_ns))
+        gone = known.keys() - seen
+        if gone:
+            self.db.executemany('DELETE FROM images WHERE path = ?', [(p,) for p in gone])
+        return changed, len(gone)
+
+    def class_names(self, split):
+        """Sorted class directory names, including empty ones, like flow_from_directory"""
+        return [row[0] for row in self.db.execute(
+            'SELECT class FROM class_dirs WHERE split = ? ORDER BY class', (split,))]
+
+    def counts(self, split):
+        """{class: number of decodable images}"""
+        return dict(self.db.execute(
+            'SELECT d.class, COUNT(i.path) FROM class_dirs d LEFT JOIN images i '
+            'ON i.split = d.split AND i.class = d.class AND i.width IS NOT NULL '
+            'WHERE d.split = ? GROUP BY d.class ORDER BY d.class', (split,)))
+
+    def samples(self, split):
+        """Sorted class names and (absolute path, label) pairs for the decodable images of a split"""
+        class_names = self.class_names(split)
+        labels = {name: i for i, name in enumerate(class_names)}
+        rows = self.db.execute('SELECT path, class FROM images WHERE split = ? AND width IS NOT NULL '
+                               'ORDER BY class, path', (split,))
+        return class_names, [(self.data_dir / path, labels[class_name]) for path, class_name in rows]
+
+    def content_digest(self, split):
+        """Hash over the path, class and content hash of every image in a split"""
+        digest = hashlib.sha1()
+        for row in self.db.execute('SELECT path, class, sha256 FROM images WHERE split = ? '
+                                   'AND width IS NOT NULL ORDER BY path', (split,)):
+            digest.update('|'.join(row).encode() + b'\n')
+        return digest.hexdigest()
+
+    def unreadable(self, split=None):
+        """Paths that have an image extension but could not be decoded"""
+        query = 'SELECT path FROM images WHERE width IS NULL'
+        params = ()
+        if split:
+            query += ' AND split = ?'
+            params = (split,)
+        return [self.data_dir / row[0] for row in self.db.execute(query, params)]
+
+    def duplicates(self):
+        """Groups of byte-identical images as {sha256: [paths]}"""
+        groups = {}
+        for sha256, path in self.db.execute(
+                'SELECT sha256, path FROM images WHERE sha256 IN '
+                '(SELECT sha256 FROM images GROUP BY sha256 HAVING COUNT(*) > 1) ORDER BY sha256, path'):
+            groups.setdefault(sha256, []).append(self.data_dir / path)
+        return groups
+
+    def leakage(self, train_split='train', val_split='val'):
+        """(train path, val path) pairs whose contents are identical"""
+        return [(self.data_dir / a, self.data_dir / b) for a, b in self.db.execute(
+            'SELECT t.path, v.path FROM images t JOIN images v ON v.sha256 = t.sha256 AND v.split = ? '
+            'WHERE t.split = ? ORDER BY t.path', (val_split, train_split))]
+
+    def dataframe(self, split):
+        """pandas DataFrame of absolute filenames and class names for flow_from_dataframe"""
+        import pandas as pd
+
+        _, samples = self.samples(split)
+        class_names = self.class_names(split)
+        return pd.DataFrame({
+            'filename': [str(path) for path, _ in samples],
+            'class': [class_names[label] for _, label in samples]
+        })
+
+    def close(self):
+        self.db.close()
+
+def open_split(split_dir, quick=False):
+    """Up-to-date manifest covering `split_dir` (a data_dir/split directory) and the split name.
+
+    quick=True skips unchanged class directories; see DatasetManifest. Callers
+    that only list files use it; content digests need the full scan.
+    """
+    split_dir = Path(split_dir)
+    manifest = DatasetManifest(split_dir.parent)
+    manifest.update(splits=(split_dir.name,), quick=quick)
+    return manifest, split_dir.name
+
+def flow_from_manifest(datagen, split_dir, target_size, batch_size, shuffle=True):
+    """ImageDataGenerator.flow_from_directory equivalent that lists files from the manifest"""
+    manifest, split = open_split(split_dir, quick=True)
+    try:
+        return datagen.flow_from_dataframe(
+            manifest.dataframe(split),
+            x_col='filename',
+            y_col='class',
+            classes=manifest.class_names(split),
+            target_size=target_size,
+            batch_size=batch_size,
+            class_mode='categorical',
+            shuffle=shuffle,
+            # Every listed file is already known to decode
+            validate_filenames=False
+        )
+    finally:
+        manifest.close()
+
+def report(data_dir='data', quick=False):
+    """Print per-split counts, unreadable files, duplicates and train/val leakage"""
+    manifest = DatasetManifest(data_dir)
+    changed, removed = manifest.update(quick=quick)
+    print(f"Manifest updated: {changed:,} added or changed, {removed:,} removed")
+    for split in ('train', 'val'):
+        counts = manifest.counts(split)
+        print(f"\n{split.upper()} SET:")
+        for class_name, count in counts.items():
+            print(f"  {class_name}: {count:,} images")
+        print(f"  Total: {sum(counts.values()):,} images")
+        unreadable = manifest.unreadable(split)
+        if unreadable:
+            print(f"  ⚠️ {len(unreadable):,} unreadable files")
+
+    duplicates = manifest.duplicates()
+    extra = sum(len(paths) - 1 for paths in duplicates.values())
+    print(f"\nExact duplicates: {len(duplicates):,} groups, {extra:,} redundant files")
+    leaks = manifest.leakage()
+    print(f"Train/val leakage: {len(leaks):,} validation images also in training")
+    for train_path, val_path in leaks[:10]:
+        print(f"  {val_path} == {train_path}")
+    manifest.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the dataset manifest and report duplicates and leakage")
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--quick', action='store_true',
+                        help="Only rescan class directories whose mtime changed (misses in-place rewrites)")
+    args = parser.parse_args()
+    report(args.data_dir, args.quick)
@@ -1,88 +1,336 @@
-import tensorflow as tf
-from tensorflow.keras import layers, models
-from tensorflow.keras.applications import MobileNetV2
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 import numpy as np
 from PIL import Image
 import os
+import threading
+from constants import (TFLITE_PATHS, SAVEDMODEL_PATH, MIXED_PRECISION, GPU_MEMORY_GROWTH, EXECUTION_MODES, LEARNING_RATE,
+                       IMG_SIZE, BASE_MODEL, BACKBONE_ALPHA, DENSE_UNITS, DROPOUT_RATE)
+from metrics import METRICS
 
-# GPU Configuration
-gpus = tf.config.experimental.list_physical_devices('GPU')
-if gpus:
+# TensorFlow is imported and devices configured on first use, not at import time
+tf = None
+gpus = []
+
+def init_tensorflow(mixed_precision=MIXED_PRECISION, memory_growth=GPU_MEMORY_GROWTH,
+                    intra_op_threads=None, inter_op_threads=None):
+    """Import TensorFlow and configure devices once per process; returns the tf module.
+    
+    mixed_precision: 'auto' enables mixed_float16 only when a GPU is found,
+    True/False force it on or off. Thread counts of None keep TF's defaults.
+    """
+    global tf, gpus
+    if tf is not None:
+        return tf
+    
+    import tensorflow
+    
+    # Thread pools must be sized before the runtime starts
+    if intra_op_threads:
+        tensorflow.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    if inter_op_threads:
+        tensorflow.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    
+    # GPU Configuration
+    gpus = tensorflow.config.list_physical_devices('GPU')
+    if gpus:
+        try:
+            if memory_growth:
+                for gpu in gpus:
+                    tensorflow.config.experimental.set_memory_growth(gpu, True)
+            print(f"GPU acceleration enabled: {len(gpus)} GPU(s) found")
+        except RuntimeError as e:
+            print(f"GPU setup error: {e}")
+    else:
+        print("No GPU found, using CPU (still fast!)")
+        print("To enable GPU: pip install tensorflow[and-cuda]")
+    
+    if mixed_precision is True or (mixed_precision == 'auto' and gpus):
+        tensorflow.keras.mixed_precision.set_global_policy('mixed_float16')
+    
+    tf = tensorflow
+    return tf
+
+def cpu_supports_bf16():
+    """True if the CPU has native bfloat16 instructions (AVX512-BF16 or AMX-BF16)"""
+    try:
+        with open('/proc/cpuinfo') as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return 'avx512_bf16' in flags or 'amx_bf16' in flags
+
+def preprocess_image(image, size=IMG_SIZE):
+    """PIL image -> uint8 (H, W, 3) array at `size`.
+    
+    JPEGs are decoded at a reduced scale (draft mode) close to `size`, so large
+    photos never pay for a full-resolution decode.
+    """
+    with METRICS.time('decode'):
+        if image.format == 'JPEG':
+            image.draft('RGB', size)
+        image = image.convert('RGB')
+    with METRICS.time('preprocess'):
+        if image.size != tuple(size):
+            image = image.resize(size)
+        return np.asarray(image, dtype=np.uint8)
+
+def preprocess_batch(images, size=IMG_SIZE):
+    """List of PIL images -> one preallocated uint8 (N, H, W, 3) batch"""
+    batch = np.empty((len(images), size[1], size[0], 3), dtype=np.uint8)
+    for i, image in enumerate(images):
+        batch[i] = preprocess_image(image, size)
+    return batch
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'}
+
+def load_image(path, size=IMG_SIZE):
+    """Decode and resize one image file to `size` as uint8, or None if unreadable"""
     try:
-        for gpu in gpus:
-            tf.config.experimental.set_memory_growth(gpu, True)
-        tf.keras.mixed_precision.set_global_policy('mixed_float16')
-        print(f"GPU acceleration enabled: {len(gpus)} GPU(s) found")
-    except RuntimeError as e:
-        print(f"GPU setup error: {e}")
-else:
-    print("No GPU found, using CPU (still fast!)")
-    print("To enable GPU: pip install tensorflow[and-cuda]")
+        with Image.open(path) as image:
+            return preprocess_image(image, size)
+    except Exception:
+        return None
+
+# Backbone name -> (keras.applications constructor, input scale, input offset,
+# whether it takes a width multiplier). Every model keeps a top-level Rescaling
+# layer mapping raw 0-255 pixels to the range its backbone expects; EfficientNet
+# normalises internally, so its Rescaling is the identity.
+BACKBONES = {
+    'MobileNetV2': ('MobileNetV2', 1./255, 0.0, True),
+    'MobileNetV3Small': ('MobileNetV3Small', 1./127.5, -1.0, True),
+    'MobileNetV3Large': ('MobileNetV3Large', 1./127.5, -1.0, True),
+    'EfficientNetB0': ('EfficientNetB0', 1.0, 0.0, False)
+}
+
+def rebuild_with_policy(model, policy):
+    """Copy of a Sequential `model` with every layer under dtype `policy`, keeping its weights.
+    
+    Layer configs record the policy they were built with, so the config is
+    rewritten rather than reused. The output layer stays float32, as in create_model.
+    """
+    def retype(node):
+        if isinstance(node, dict):
+            layer_config = node.get('config')
+            if node.get('class_name') != 'InputLayer' and isinstance(layer_config, dict) and 'dtype' in layer_config:
+                layer_config['dtype'] = policy
+            for value in node.values():
+                retype(value)
+        elif isinstance(node, list):
+            for value in node:
+                retype(value)
+    
+    config = model.get_config()
+    retype(config['layers'])
+    config['layers'][-1]['config']['dtype'] = 'float32'
+    rebuilt = tf.keras.Sequential.from_config(config)
+    rebuilt.set_weights(model.get_weights())
+    return rebuilt
 
 class CatDogClassifier:
     def __init__(self):
         self.model = None
-        self.img_size = (128, 128)
+        self.img_size = IMG_SIZE
         self.classes = ['cat', 'dog', 'other']
+        # Architecture, see BACKBONES
+        self.base_model = BASE_MODEL
+        self.alpha = BACKBONE_ALPHA
+        self.dense_units = DENSE_UNITS
+        self.dropout_rate = DROPOUT_RATE
+        self.backend = 'keras'
+        self.interpreter = None
+        self._interpreter_lock = threading.Lock()
+        self.steps_per_execution = 1
+        self.execution_mode = 'eager'
+        self.jit_compile = False
+        # Concrete inference function with a fixed uint8 input signature, see serving_function()
+        self._compiled_predict = None
+        self._saved_model = None
+        # Scaled up for data-parallel training with a larger global batch
+        self.learning_rate = LEARNING_RATE
         
-    def create_model(self):
-        base_model = MobileNetV2(
-            weights='imagenet',
+    def create_model(self, weights='imagenet'):
+        init_tensorflow()
+        layers = tf.keras.layers
+        if self.base_model not in BACKBONES:
+            raise ValueError(f"Unknown base model: {self.base_model} (choose from {', '.join(BACKBONES)})")
+        constructor, scale, offset, has_alpha = BACKBONES[self.base_model]
+        kwargs = {'alpha': self.alpha} if has_alpha else {}
+        if self.base_model.startswith('MobileNetV3'):
+            # Rescaling below already maps pixels to [-1, 1]
+            kwargs['include_preprocessing'] = False
+        base_model = getattr(tf.keras.applications, constructor)(
+            weights=weights,
             include_top=False,
-            input_shape=(128, 128, 3)
+            input_shape=(*self.img_size, 3),
+            **kwargs
         )
         base_model.trainable = False
+        self._compiled_predict = None
         
-        self.model = models.Sequential([
+        # Rescaling lives in the graph so every caller feeds raw 0-255 pixels
+        self.model = tf.keras.Sequential([
+            layers.Input(shape=(*self.img_size, 3)),
+            layers.Rescaling(scale, offset=offset),
             base_model,
             layers.GlobalAveragePooling2D(),
-            layers.Dense(64, activation='relu'),
-            layers.Dropout(0.2),
-            layers.Dense(3, activation='softmax', dtype='float32')
+            layers.Dense(self.dense_units, activation='relu'),
+            layers.Dropout(self.dropout_rate),
+            layers.Dense(len(self.classes), activation='softmax', dtype='float32')
         ])
         
         self.model.compile(
+            optimizer=tf.keras.optimizers.Adam(self.learning_rate),
+            loss='categorical_crossentropy',
+            metrics=['accuracy'],
+            steps_per_execution=self.steps_per_execution,
+            jit_compile=self.jit_compile
+        )
+        
+    def set_execution_mode(self, mode):
+        """Select how the model runs: 'eager', 'xla', 'bf16' or 'xla_bf16'.
+        
+        'eager' is plain Keras. 'xla' compiles training steps and inference with
+        XLA JIT. 'bf16' uses the mixed_bfloat16 policy, falling back to float32
+        on CPUs without native bfloat16 support. Call before create_model();
+        an already loaded model is rebuilt under the new policy.
+        """
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode: {mode}")
+        if mode == self.execution_mode:
+            return
+        init_tensorflow()
+        self.execution_mode = mode
+        self.jit_compile = 'xla' in mode
+        
+        use_bf16 = 'bf16' in mode
+        if use_bf16 and not gpus and not cpu_supports_bf16():
+            print("⚠️ CPU has no native bfloat16 support, staying in float32")
+            use_bf16 = False
+        if use_bf16:
+            tf.keras.mixed_precision.set_global_policy('mixed_bfloat16')
+        elif tf.keras.mixed_precision.global_policy().name == 'mixed_bfloat16':
+            tf.keras.mixed_precision.set_global_policy('float32')
+        
+        if self.model is not None and self.interpreter is None:
+            # Rebuild so layers pick up the new dtype policy and recompile for XLA. The
+            # loaded model's own config is used, since its backbone may not be BASE_MODEL.
+            self.model = rebuild_with_policy(self.model, tf.keras.mixed_precision.global_policy().name)
+            self.model.compile(
+                optimizer=tf.keras.optimizers.Adam(self.learning_rate),
+                loss='categorical_crossentropy',
+                metrics=['accuracy'],
+                steps_per_execution=self.steps_per_execution,
+                jit_compile=self.jit_compile
+            )
+            self._compiled_predict = None
+    
+    def serving_function(self, jit_compile=None):
+        """tf.function over the model with a fixed (None, H, W, 3) uint8 input signature.
+        
+        The fixed signature means it is traced exactly once, whatever the batch
+        size, and calling it skips the data adapter and iterator that
+        model.predict builds on every call.
+        """
+        model = self.model
+        spec = tf.TensorSpec((None, *self.img_size, 3), tf.uint8, name='images')
+        
+        @tf.function(input_signature=[spec],
+                     jit_compile=self.jit_compile if jit_compile is None else jit_compile)
+        def serve(images):
+            return {'probabilities': model(tf.cast(images, tf.float32), training=False)}
+        return serve
+    
+    def export_saved_model(self, path=SAVEDMODEL_PATH):
+        """Export a SavedModel whose serving_default signature takes raw uint8 pixels"""
+        init_tensorflow()
+        tf.saved_model.save(self.model, path, signatures={'serving_default': self.serving_function(jit_compile=False)})
+    
+    def backbone(self):
+        """The pretrained base network inside self.model"""
+        return next(layer for layer in self.model.layers if isinstance(layer, tf.keras.Model))
+    
+    def _pool_index(self):
+        return next(i for i, layer in enumerate(self.model.layers)
+                    if isinstance(layer, tf.keras.layers.GlobalAveragePooling2D))
+    
+    def feature_extractor(self):
+        """Rescaling + frozen backbone + pooling, producing the embeddings the head is trained on"""
+        pool = self._pool_index()
+        return tf.keras.Sequential([tf.keras.layers.Input(shape=(*self.img_size, 3)), *self.model.layers[:pool + 1]])
+    
+    def head_model(self):
+        """Dense/Dropout head sharing its layers (and weights) with self.model"""
+        head_layers = self.model.layers[self._pool_index() + 1:]
+        embedding_dim = head_layers[0].kernel.shape[0]
+        head = tf.keras.Sequential([tf.keras.layers.Input(shape=(embedding_dim,)), *head_layers])
+        head.compile(
             optimizer=tf.keras.optimizers.Adam(0.001),
             loss='categorical_crossentropy',
-            metrics=['accuracy']
+            metrics=['accuracy'],
+            steps_per_execution=self.steps_per_execution,
+            jit_compile=self.jit_compile
         )
+        return head
+    
+    def train_head(self, train_features, train_labels, val_features, val_labels,
+                   epochs=20, callbacks=None, batch_size=128, initial_epoch=0):
+        """Train only the head on precomputed embeddings; the full model picks up the weights"""
+        head = self.head_model()
+        return head.fit(
+            train_features,
+            train_labels,
+            epochs=epochs,
+            batch_size=batch_size,
+            validation_data=(val_features, val_labels),
+            callbacks=callbacks,
+            shuffle=True,
+            initial_epoch=initial_epoch
+        )
+    
+    def train_model(self, train_dir, val_dir, epochs=20, pipeline='generator', batch_size=None):
+        init_tensorflow()
+        if pipeline == 'tf.data':
+            from autotune import tuned_batch_size
+            from data_loader import DataLoader
+            train_generator, val_generator = DataLoader().create_tf_datasets(
+                train_dir, val_dir, batch_size=batch_size or tuned_batch_size(), img_size=self.img_size
+            )
+            return self._fit(train_generator, val_generator, epochs)
         
-    def train_model(self, train_dir, val_dir, epochs=20):
+        train_generator, val_generator = self.create_generators(train_dir, val_dir, batch_size)
+        return self._fit(train_generator, val_generator, epochs)
+    
+    def create_generators(self, train_dir, val_dir, batch_size=None):
+        """Augmenting train and plain val generators; batch_size defaults to the autotune.py result"""
+        init_tensorflow()
+        ImageDataGenerator = tf.keras.preprocessing.image.ImageDataGenerator
+        # No rescale: the model rescales in-graph
         train_datagen = ImageDataGenerator(
-            rescale=1./255,
             rotation_range=20,
             horizontal_flip=True
         )
         
-        val_datagen = ImageDataGenerator(rescale=1./255)
+        val_datagen = ImageDataGenerator()
         
-        # Optimized batch size
-        batch_size = 128 if gpus else 32
+        if batch_size is None:
+            from autotune import tuned_batch_size
+            batch_size = tuned_batch_size()
         
-        train_generator = train_datagen.flow_from_directory(
-            train_dir,
-            target_size=self.img_size,
-            batch_size=batch_size,
-            class_mode='categorical'
-        )
-        
-        val_generator = val_datagen.flow_from_directory(
-            val_dir,
-            target_size=self.img_size,
-            batch_size=batch_size,
-            class_mode='categorical'
-        )
+        from manifest import flow_from_manifest
+        train_generator = flow_from_manifest(train_datagen, train_dir, self.img_size, batch_size)
+        val_generator = flow_from_manifest(val_datagen, val_dir, self.img_size, batch_size)
         
+        return train_generator, val_generator
+    
+    def _fit(self, train_data, val_data, epochs):
         callbacks = [
             tf.keras.callbacks.EarlyStopping(patience=3, restore_best_weights=True),
             tf.keras.callbacks.ReduceLROnPlateau(factor=0.5, patience=2)
         ]
         
         history = self.model.fit(
-            train_generator,
+            train_data,
             epochs=epochs,
-            validation_data=val_generator,
+            validation_data=val_data,
             callbacks=callbacks
         )
         
@@ -92,21 +340,100 @@ class CatDogClassifier:
         if isinstance(image, str):
             image = Image.open(image)
         
-        image = image.convert('RGB')
-        image = image.resize(self.img_size)
-        image_array = np.array(image) / 255.0
-        image_array = np.expand_dims(image_array, axis=0)
+        image_array = preprocess_image(image, self.img_size)[np.newaxis]
+        
+        # One forward pass gives the top class and every per-class score
+        predictions = self._infer(image_array)[0]
+        with METRICS.time('postprocess'):
+            confidence = float(np.max(predictions))
+            predicted_class = self.classes[np.argmax(predictions)]
         
-        predictions = self.model.predict(image_array)
-        confidence = float(np.max(predictions))
-        predicted_class = self.classes[np.argmax(predictions)]
+        return predicted_class, confidence, predictions
+    
+    def predict_many(self, images):
+        """Classify several PIL images in one forward pass; returns a list of predict() results"""
+        batch = preprocess_batch(images, self.img_size)
+        probabilities = self.predict_batch(batch)
+        with METRICS.time('postprocess'):
+            return [(self.classes[np.argmax(p)], float(np.max(p)), p) for p in probabilities]
+    
+    def predict_batch(self, images):
+        """Return class probabilities for a uint8 batch of shape (N, H, W, 3)"""
+        return self._infer(np.asarray(images, dtype=np.uint8))
+    
+    def warm_up(self):
+        """Run one dummy inference so the first real request is fast"""
+        dummy = np.zeros((1, *self.img_size, 3), dtype=np.uint8)
+        self._infer(dummy)
+    
+    def _infer(self, image_array):
+        """Forward pass on a uint8 batch through whichever backend is loaded"""
+        with METRICS.time('infer'):
+            return self._forward(image_array)
+    
+    def _forward(self, image_array):
+        if self.interpreter is None:
+            if self._compiled_predict is None:
+                self._compiled_predict = self.serving_function().get_concrete_function()
+            return self._compiled_predict(images=tf.constant(image_array))['probabilities'].numpy()
         
-        return predicted_class, confidence
+        image_array = np.asarray(image_array, dtype=np.float32)
+        # The interpreter holds per-call tensor state, so serialize access
+        with self._interpreter_lock:
+            input_detail = self.interpreter.get_input_details()[0]
+            if input_detail['shape'][0] != len(image_array):
+                self.interpreter.resize_tensor_input(input_detail['index'], image_array.shape)
+                self.interpreter.allocate_tensors()
+            self.interpreter.set_tensor(input_detail['index'], image_array)
+            self.interpreter.invoke()
+            output_index = self.interpreter.get_output_details()[0]['index']
+            return self.interpreter.get_tensor(output_index).copy()
     
     def save_model(self, path='cat_dog_model.h5'):
         self.model.save(path)
     
-    def load_model(self, path='cat_dog_model.h5'):
+    def load_model(self, path='cat_dog_model.h5', backend='keras', shared=False, num_threads=None,
+                   fallback=True):
+        """Load the model for the given backend: keras, savedmodel, tflite-fp32, tflite-fp16 or tflite-int8
+        
+        shared=True (TFLite only) keeps the weights in the read-only memory-mapped
+        .tflite file, so every process serving the same file shares one copy.
+        num_threads defaults to every core. With fallback=False a Keras model
+        that fails to load raises instead of being replaced by an untrained one.
+        """
+        init_tensorflow()
+        if backend == 'savedmodel':
+            if not os.path.isdir(path):
+                path = SAVEDMODEL_PATH
+            self.interpreter = None
+            self.model = None
+            # Keep the loaded object alive: the signature only holds weak references to its variables
+            self._saved_model = tf.saved_model.load(path)
+            self._compiled_predict = self._saved_model.signatures['serving_default']
+            input_spec = self._compiled_predict.structured_input_signature[1]['images']
+            self.img_size = tuple(int(d) for d in input_spec.shape[1:3])
+            self.backend = backend
+            return
+        if backend != 'keras':
+            if backend not in TFLITE_PATHS:
+                raise ValueError(f"Unknown backend: {backend}")
+            if not path.endswith('.tflite'):
+                path = TFLITE_PATHS[backend]
+            kwargs = {}
+            if shared:
+                # XNNPACK repacks weights into private buffers; the builtin kernels
+                # read constant tensors in place from the mapping
+                kwargs['experimental_op_resolver_type'] = \
+                    tf.lite.experimental.OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+            self.interpreter = tf.lite.Interpreter(model_path=path, num_threads=num_threads or os.cpu_count(),
+                                                   **kwargs)
+            self.interpreter.allocate_tensors()
+            self.img_size = tuple(int(d) for d in self.interpreter.get_input_details()[0]['shape'][1:3])
+            self.backend = backend
+            return
+        
+        self.interpreter = None
+        self.backend = 'keras'
         try:
             # Try loading with custom objects for compatibility
             self.model = tf.keras.models.load_model(
@@ -114,12 +441,27 @@ class CatDogClassifier:
                 compile=False,
                 custom_objects=None
             )
+            # Serve at whatever resolution the saved model was trained at
+            self.img_size = tuple(self.model.input_shape[1:3])
+            if not any(isinstance(layer, tf.keras.layers.Rescaling) for layer in self.model.layers):
+                # Models saved before rescaling moved in-graph expect 0-1 inputs
+                self.model = tf.keras.Sequential([
+                    tf.keras.layers.Input(shape=(*self.img_size, 3)),
+                    tf.keras.layers.Rescaling(1./255),
+                    *self.model.layers
+                ])
             self.model.compile(
                 optimizer=tf.keras.optimizers.Adam(0.001),
                 loss='categorical_crossentropy',
-                metrics=['accuracy']
+                metrics=['accuracy'],
+                steps_per_execution=self.steps_per_execution,
+                jit_compile=self.jit_compile
             )
+            # Trace the fixed-signature inference function now rather than on the first request
+            self._compiled_predict = self.serving_function().get_concrete_function()
         except Exception as e:
+            if not fallback:
+                raise
             # Fallback: create new model if loading fails
             print(f"Model loading failed: {e}")
             self.create_model()
\ No newline at end of file
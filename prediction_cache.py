@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from constants import *
+
+def image_key(data):
+    """Cache key for raw image bytes"""
+    return 'img:' + hashlib.sha256(data).hexdigest()
+
+def url_key(url, validator):
+    """Cache key for a URL whose response carried an ETag or Last-Modified validator"""
+    return 'url:' + hashlib.sha256(f"{url}\n{validator}".encode()).hexdigest()
+
+def model_fingerprint(path):
+    """Content hash of the model file, or None if it does not exist"""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class PredictionCache:
+    """Two-tier cache of class probabilities: bounded in-memory LRU over a SQLite store.
+
+    Entries are tied to the model file's fingerprint; when the model changes,
+    predictions made by the old model are no longer served. Several processes
+    serving different models may share the SQLite file, so rows of other
+    models are kept and age out with least-recently-used pruning. `model_path` may
+    also be a sequence of files (e.g. both cascade models), and `salt` any
+    other setting the predictions depend on (e.g. the cascade threshold).
+    """
+    def __init__(self, model_path=MODEL_PATH, db_path=PREDICTION_CACHE_PATH,
+                 memory_entries=PREDICTION_CACHE_MEMORY_ENTRIES, disk_entries=PREDICTION_CACHE_DISK_ENTRIES,
+                 salt=''):
+        self.model_path = model_path
+        self.model_paths = [model_path] if isinstance(model_path, (str, os.PathLike)) else list(model_path)
+        self.salt = salt
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'invalidations': 0}
+
+        self.db = sqlite3.connect(db_path, check_same_thread=False) if db_path else None
+        if self.db is not None:
+            self.db.execute('PRAGMA journal_mode=WAL')
+            # A lost entry is only a future miss, so commits need not wait for fsync
+            self.db.execute('PRAGMA synchronous=NORMAL')
+            if self.db.execute('PRAGMA user_version').fetchone()[0] < 1:
+                # Earlier files keyed rows on the image alone, so models overwrote each other's entries
+                self.db.execute('DROP TABLE IF EXISTS predictions')
+                self.db.execute('PRAGMA user_version = 1')
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS predictions ('
+                'key TEXT NOT NULL, model TEXT NOT NULL, probs TEXT NOT NULL, accessed REAL NOT NULL, '
+                'PRIMARY KEY (key, model))'
+            )
+            self.db.execute('CREATE INDEX IF NOT EXISTS predictions_accessed ON predictions (accessed)')
+            self.db.commit()
+
+        self._puts = 0
+        self._model_stat = None
+        self.fingerprint = None
+        self._check_model()
+
+    def _check_model(self):
+        """Re-fingerprint the model when its size or mtime changes, forgetting in-memory entries"""
+        model_stat = []
+        for path in self.model_paths:
+            try:
+                stat = os.stat(path)
+                model_stat.append((stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                model_stat.append(None)
+        if model_stat == self._model_stat:
+            return
+        self._model_stat = model_stat
+        fingerprint = self._fingerprint()
+        if fingerprint == self.fingerprint:
+            return
+        if self.fingerprint is not None:
+            self.counters['invalidations'] += 1
+        self.fingerprint = fingerprint
+        self.memory.clear()
+
+    def _fingerprint(self):
+        fingerprints = [model_fingerprint(path) for path in self.model_paths]
+        if len(fingerprints) == 1 and not self.salt:
+            return fingerprints[0]
+        if None in fingerprints:
+            return None
+        return hashlib.sha256('|'.join([*fingerprints, self.salt]).encode()).hexdigest()
+
+    def get(self, key):
+        """Cached probabilities for `key`, or None"""
+        with self.lock:
+            self._check_model()
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return self.memory[key]
+            if self.db is not None:
+                row = self.db.execute('SELECT probs FROM predictions WHERE key = ? AND model = ?',
+                                      (key, self.fingerprint or '')).fetchone()
+                if row is not None:
+                    probs = json.loads(row[0])
+                    self.db.execute('UPDATE predictions SET accessed = ? WHERE key = ? AND model = ?',
+                                    (time.time(), key, self.fingerprint or ''))
+                    self.db.commit()
+                    self._remember(key, probs)
+                    self.counters['disk_hits'] += 1
+                    return probs
+            self.counters['misses'] += 1
+            return None
+
+    def put(self, key, probs):
+        """Store probabilities for `key` in both tiers"""
+        probs = [float(p) for p in probs]
+        with self.lock:
+            self._check_model()
+            self._remember(key, probs)
+            if self.db is not None:
+                self.db.execute('INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)',
+                                (key, self.fingerprint or '', json.dumps(probs), time.time()))
+                self._puts += 1
+                if self._puts % 1000 == 0:
+                    self._prune_disk()
+                self.db.commit()
+
+    def _remember(self, key, probs):
+        self.memory[key] = probs
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _prune_disk(self):
+        count = self.db.execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+        if count > self.disk_entries:
+            # Drop the least recently used tenth so pruning stays infrequent
+            excess = count - self.disk_entries + self.disk_entries // 10
+            self.db.execute('DELETE FROM predictions WHERE rowid IN '
+                            '(SELECT rowid FROM predictions ORDER BY accessed LIMIT ?)', (excess,))
+
+    def stats(self):
+        """Hit/miss counters and tier sizes"""
+        with self.lock:
+            lookups = self.counters['memory_hits'] + self.counters['disk_hits'] + self.counters['misses']
+            hits = self.counters['memory_hits'] + self.counters['disk_hits']
+            disk_size = self.db.execute('SELECT COUNT(*) FROM predictions').fetchone()[0] if self.db else 0
+            return {
+                **self.counters,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'memory_size': len(self.memory),
+                'disk_size': disk_size
+            }
+
+def predict_many_cached(classifier, cache, images, keys):
+    """classifier.predict_many for the cache misses only; returns results for every image"""
+    results = [None] * len(images)
+    missing = []
+    for i, key in enumerate(keys):
+        probs = cache.get(key)
+        if probs is None:
+            missing.append(i)
+        else:
+            best = max(range(len(probs)), key=probs.__getitem__)
+            results[i] = (classifier.classes[best], probs[best], probs)
+
+    if missing:
+        for i, result in zip(missing, classifier.predict_many([images[i] for i in missing])):
+            cache.put(keys[i], result[2])
+            results[i] = result
+    return results
@@ -1,6 +1,7 @@
 import tensorflow as tf
 from model import CatDogClassifier
 from data_loader import DataLoader
+from autotune import apply_tuning
 from constants import *
 
 def quick_train():
@@ -13,12 +14,16 @@ def quick_train():
     data_loader = DataLoader()
     dirs = data_loader.setup_directories()
     
+    # Machine-specific settings from autotune.py, if it has been run
+    batch_size = apply_tuning(classifier)
+    classifier.set_execution_mode(EXECUTION_MODE)
+    
     # Create model
     classifier.create_model()
     
     # Fast data generators
-    train_gen, val_gen = data_loader.create_data_generators(
-        dirs['train'], dirs['val']
+    train_gen, val_gen = data_loader.create_input_pipeline(
+        dirs['train'], dirs['val'], batch_size=batch_size
     )
     
     # Minimal callbacks for speed
@@ -27,13 +32,23 @@ def quick_train():
     ]
     
     # Train fast
-    history = classifier.model.fit(
-        train_gen,
-        epochs=EPOCHS,
-        validation_data=val_gen,
-        callbacks=callbacks,
-        verbose=1
-    )
+    if USE_FEATURE_CACHE:
+        from feature_cache import load_features
+        train_x, train_y, val_x, val_y = load_features(classifier, dirs['train'], dirs['val'])
+        history = classifier.train_head(
+            train_x, train_y, val_x, val_y,
+            epochs=EPOCHS,
+            batch_size=batch_size,
+            callbacks=callbacks
+        )
+    else:
+        history = classifier.model.fit(
+            train_gen,
+            epochs=EPOCHS,
+            validation_data=val_gen,
+            callbacks=callbacks,
+            verbose=1
+        )
     
     # Save model
     classifier.save_model(MODEL_PATH)
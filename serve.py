@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from metrics import METRICS
+from model import preprocess_image
+from prediction_cache import PredictionCache, image_key
+from constants import *
+
+class MicroBatcher:
+    """Groups queued requests into batches bounded by size and wait time.
+
+    Requests wait at most `max_wait_ms` for companions after the first one of a
+    batch arrives, then the whole batch runs in one forward pass.
+    """
+    def __init__(self, classifier, max_batch_size=SERVE_MAX_BATCH_SIZE, max_wait_ms=SERVE_MAX_WAIT_MS):
+        self.classifier = classifier
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = asyncio.Queue()
+        # One inference thread: the model already uses every core per batch
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.batches = 0
+        self.requests = 0
+
+    async def predict(self, image_array):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        await self.queue.put((image_array, future, loop.time()))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            now = loop.time()
+            for _, _, enqueued in batch:
+                METRICS.observe('queue', now - enqueued)
+            arrays = np.stack([array for array, _, _ in batch])
+            try:
+                probabilities = await loop.run_in_executor(self.executor, self.classifier.predict_batch, arrays)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.requests += len(batch)
+            for (_, future, _), probs in zip(batch, probabilities):
+                if not future.done():
+                    future.set_result(probs)
+
+def decode_request_image(data, size=IMG_SIZE):
+    """Decode request bytes into a uint8 array at the model's input `size`"""
+    with Image.open(BytesIO(data)) as image:
+        return preprocess_image(image, size)
+
+class InferenceServer:
+    """Minimal HTTP/1.1 server: POST /predict with raw image bytes, GET /health, /stats and /metrics"""
+    def __init__(self, classifier, max_batch_size=SERVE_MAX_BATCH_SIZE, max_wait_ms=SERVE_MAX_WAIT_MS,
+                 decode_workers=None, max_body_bytes=MAX_IMAGE_BYTES, cache=None):
+        self.batcher = MicroBatcher(classifier, max_batch_size, max_wait_ms)
+        self.cache = cache
+        # Cache lookups and writes hit SQLite, so they run off the event loop, one at a time
+        self.cache_pool = ThreadPoolExecutor(max_workers=1)
+        self.decode_pool = ThreadPoolExecutor(max_workers=decode_workers or os.cpu_count())
+        self.max_body_bytes = max_body_bytes
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length > self.max_body_bytes:
+                    await self.respond(writer, 413, {'error': 'Request body too large'}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                status, payload = await self.route(method, path, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        if method == 'GET' and path == '/health':
+            return 200, {'status': 'ok'}
+        if method == 'GET' and path == '/stats':
+            batcher = self.batcher
+            cache_stats = None
+            if self.cache:
+                cache_stats = await asyncio.get_running_loop().run_in_executor(self.cache_pool, self.cache.stats)
+            return 200, {
+                'requests': batcher.requests,
+                'batches': batcher.batches,
+                'mean_batch_size': batcher.requests / batcher.batches if batcher.batches else 0.0,
+                'queue_depth': batcher.queue.qsize(),
+                'cache': cache_stats,
+                'cascade': batcher.classifier.stats() if hasattr(batcher.classifier, 'stats') else None,
+                'latency': METRICS.summary()
+            }
+        if method == 'GET' and path == '/metrics':
+            if hasattr(self.batcher.classifier, 'prometheus'):
+                return 200, METRICS.prometheus() + self.batcher.classifier.prometheus()
+            return 200, METRICS.prometheus()
+        if method == 'POST' and path == '/predict':
+            loop = asyncio.get_running_loop()
+            key = image_key(body)
+            probs = await loop.run_in_executor(self.cache_pool, self.cache.get, key) if self.cache else None
+            if probs is None:
+                try:
+                    image_array = await loop.run_in_executor(self.decode_pool, decode_request_image, body,
+                                                             self.batcher.classifier.img_size)
+                except Exception as e:
+                    return 400, {'error': f"Invalid image: {e}"}
+                try:
+                    probs = await self.batcher.predict(image_array)
+                except Exception as e:
+                    return 500, {'error': f"Inference failed: {e}"}
+                if self.cache:
+                    # Written behind the response: nothing waits on the commit
+                    loop.run_in_executor(self.cache_pool, self.cache.put, key, probs)
+            with METRICS.time('postprocess'):
+                return 200, {
+                    'predicted_class': CLASS_NAMES[int(np.argmax(probs))],
+                    'confidence': float(np.max(probs)),
+                    'probabilities': {name: float(p) for name, p in zip(CLASS_NAMES, probs)}
+                }
+        return 404, {'error': 'Not found'}
+
+    async def respond(self, writer, status, payload, keep_alive):
+        # Strings go out as Prometheus text, everything else as JSON
+        if isinstance(payload, str):
+            body, content_type = payload.encode(), 'text/plain; version=0.0.4'
+        else:
+            body, content_type = json.dumps(payload).encode(), 'application/json'
+        reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+                  500: 'Internal Server Error'}.get(status, '')
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+
+    async def serve(self, host=SERVE_HOST, port=SERVE_PORT, reuse_port=False):
+        batch_task = asyncio.create_task(self.batcher.run())
+        # reuse_port lets several worker processes accept on the same port
+        server = await asyncio.start_server(self.handle_connection, host, port, reuse_port=reuse_port)
+        print(f"🚀 Serving on http://{host}:{port} (max batch {self.batcher.max_batch_size}, "
+              f"max wait {self.batcher.max_wait * 1000:.1f} ms)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batch_task.cancel()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-batching HTTP inference service")
+    parser.add_argument('--host', default=SERVE_HOST)
+    parser.add_argument('--port', type=int, default=SERVE_PORT)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--backend', default=INFERENCE_BACKEND, choices=['keras', 'savedmodel', *TFLITE_PATHS])
+    parser.add_argument('--execution-mode', default=EXECUTION_MODE, choices=EXECUTION_MODES)
+    parser.add_argument('--max-batch-size', type=int, default=SERVE_MAX_BATCH_SIZE)
+    parser.add_argument('--max-wait-ms', type=float, default=SERVE_MAX_WAIT_MS)
+    parser.add_argument('--no-cache', action='store_true', help="Disable the prediction cache")
+    parser.add_argument('--cascade', action='store_true', default=USE_CASCADE,
+                        help="Answer with the small model first, escalating uncertain images (see cascade.py)")
+    parser.add_argument('--workers', type=int, default=SERVE_WORKERS,
+                        help="Forked server processes sharing one memory-mapped copy of the weights")
+    args = parser.parse_args(argv)
+
+    if args.workers <= 1:
+        run_server(0, args)
+        return
+    if args.cascade:
+        parser.error("--cascade runs in a single process")
+    from shared_weights import ensure_artifact, preload, run_workers
+    # Shared weights need a TFLite file; fall back to SHARED_WEIGHTS_BACKEND for keras/savedmodel
+    backend = args.backend if args.backend in TFLITE_PATHS else SHARED_WEIGHTS_BACKEND
+    path = ensure_artifact(args.model, backend)
+    preload()
+    run_workers(run_server, args.workers, (args, backend, path))
+
+def run_server(rank, args, shared_backend=None, shared_path=None):
+    """Load the model and serve until interrupted; one of several forked workers when shared_path is set"""
+    # The SavedModel is exported from --model, so its cache entries follow that file
+    model_path = TFLITE_PATHS.get(args.backend, args.model)
+    cache_salt = ''
+    if shared_path:
+        from model import CatDogClassifier
+        from shared_weights import worker_threads
+        classifier = CatDogClassifier()
+        classifier.load_model(shared_path, backend=shared_backend, shared=True,
+                              num_threads=worker_threads(args.workers))
+        model_path = shared_path
+    elif args.cascade:
+        from cascade import load_cascade
+        classifier = load_cascade(args.model, backend=args.backend, execution_mode=args.execution_mode)
+        # Retraining either model or changing the threshold invalidates the cache
+        model_path = classifier.model_paths
+        cache_salt = f"cascade threshold {classifier.threshold}"
+    else:
+        from model import CatDogClassifier
+        classifier = CatDogClassifier()
+        classifier.load_model(args.model, backend=args.backend)
+        if args.backend == 'keras':
+            classifier.set_execution_mode(args.execution_mode)
+    classifier.warm_up()
+
+    cache = None
+    if not args.no_cache:
+        cache = PredictionCache(model_path, salt=cache_salt)
+    server = InferenceServer(classifier, args.max_batch_size, args.max_wait_ms, cache=cache)
+    asyncio.run(server.serve(args.host, args.port, reuse_port=shared_path is not None))
+
+if __name__ == "__main__":
+    main()
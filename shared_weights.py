@@ -0,0 +1,186 @@
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from constants import *
+
+def memory_usage(pid='self'):
+    """Resident memory of a process in MB: RSS, PSS (shared pages split between their users),
+    shared and private, from /proc/<pid>/smaps_rollup. Only RSS is available without it."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    except OSError:
+        with open(f"/proc/{pid}/status") as f:
+            rss = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+        return {'rss_mb': rss / 1024}
+    return {
+        'rss_mb': fields.get('Rss', 0.0),
+        'pss_mb': fields.get('Pss', 0.0),
+        'shared_mb': fields.get('Shared_Clean', 0.0) + fields.get('Shared_Dirty', 0.0),
+        'private_mb': fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0)
+    }
+
+def export_artifact(model_path=MODEL_PATH, backend=SHARED_WEIGHTS_BACKEND, val_dir='data/val'):
+    """Convert the Keras model to the TFLite file the workers map"""
+    from export_tflite import convert, load_val_samples
+    from model import CatDogClassifier
+
+    classifier = CatDogClassifier()
+    # Never export (and then serve from every worker) an untrained stand-in
+    classifier.load_model(model_path, fallback=False)
+    calibration = load_val_samples(val_dir, 200)[0] if backend == 'tflite-int8' else None
+    path = TFLITE_PATHS[backend]
+    with open(path + '.tmp', 'wb') as f:
+        f.write(convert(classifier.model, backend, calibration))
+    os.replace(path + '.tmp', path)
+
+def ensure_artifact(model_path=MODEL_PATH, backend=SHARED_WEIGHTS_BACKEND):
+    """Path of the read-only weights file, (re)exported when missing or older than `model_path`.
+
+    Deployments that ship only the .tflite file (no `model_path`) use it as is.
+    The export runs in a child process: the parent must not start the
+    TensorFlow runtime before it forks its workers.
+    """
+    path = TFLITE_PATHS[backend]
+    if os.path.exists(path) and not os.path.exists(model_path):
+        return path
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Neither {path} nor {model_path} exists")
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(model_path):
+        print(f"🔄 Exporting {model_path} to {path}...")
+        subprocess.run([sys.executable, __file__, 'export', '--model', model_path, '--backend', backend], check=True)
+    return path
+
+def preload():
+    """Import the inference libraries before forking so workers share those pages.
+
+    Only imports: TensorFlow's runtime is not fork-safe once started, so each
+    worker initialises its own. gc.freeze() keeps the garbage collector from
+    touching (and so copying) the preloaded objects in the children.
+    """
+    import tensorflow  # noqa: F401
+    import model  # noqa: F401
+    gc.freeze()
+
+def worker_threads(workers):
+    return max((os.cpu_count() or 1) // workers, 1)
+
+def run_workers(target, workers, args=()):
+    """Fork `workers` processes running target(rank, *args) and wait for all of them"""
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=target, args=(rank, *args)) for rank in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+    return [process.exitcode for process in processes]
+
+def load_worker_classifier(mode, path, threads):
+    """'private': each worker loads the Keras model into its own TF variables (the default serving setup).
+    'shared': each worker maps the same read-only TFLite file."""
+    from model import CatDogClassifier, init_tensorflow
+
+    classifier = CatDogClassifier()
+    if mode == 'shared':
+        classifier.load_model(path, backend=SHARED_WEIGHTS_BACKEND, shared=True, num_threads=threads)
+    else:
+        init_tensorflow(intra_op_threads=threads, inter_op_threads=1)
+        classifier.load_model(path, fallback=False)
+    classifier.warm_up()
+    return classifier
+
+def _measure_worker(rank, mode, path, threads, runs, results, done):
+    classifier = load_worker_classifier(mode, path, threads)
+    batch = np.random.default_rng(rank).integers(0, 256, (1, *classifier.img_size, 3), dtype=np.uint8)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        classifier.predict_batch(batch)
+        timings.append((time.perf_counter() - start) * 1000)
+    results.put({'rank': rank, 'p50_ms': float(np.percentile(timings, 50)), **memory_usage()})
+    # Stay alive until every worker has reported, so all of them are measured together
+    done.wait()
+
+def measure(mode, workers, path, runs=50):
+    """Load the model in `workers` forked processes and measure each one's memory and latency"""
+    context = multiprocessing.get_context('fork')
+    results, done = context.Queue(), context.Event()
+    processes = [context.Process(target=_measure_worker,
+                                 args=(rank, mode, path, worker_threads(workers), runs, results, done))
+                 for rank in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        per_worker = sorted((results.get(timeout=900) for _ in processes), key=lambda r: r['rank'])
+        parent = memory_usage()
+    finally:
+        done.set()
+        for process in processes:
+            process.join()
+
+    # PSS over the parent and all workers counts every shared page exactly once
+    everyone = [parent, *per_worker]
+    return {
+        'mode': mode,
+        'workers': workers,
+        'parent': parent,
+        'per_worker': per_worker,
+        'worker_rss_mb': float(np.mean([r['rss_mb'] for r in per_worker])),
+        'worker_pss_mb': float(np.mean([r.get('pss_mb', r['rss_mb']) for r in per_worker])),
+        'total_rss_mb': sum(r['rss_mb'] for r in everyone),
+        'total_pss_mb': sum(r.get('pss_mb', r['rss_mb']) for r in everyone),
+        'p50_ms': float(np.median([r['p50_ms'] for r in per_worker]))
+    }
+
+def report(workers=4, model_path=MODEL_PATH, runs=50, output='shared_memory.json'):
+    """Memory of `workers` serving processes with private Keras weights (before) and shared mapped weights (after)"""
+    # Private first: preloading for the shared run changes the parent for good
+    results = [measure('private', workers, model_path, runs)]
+    path = ensure_artifact(model_path)
+    preload()
+    results.append(measure('shared', workers, path, runs))
+
+    print(f"\n{'mode':>8} {'worker RSS':>11} {'worker PSS':>11} {'total RSS':>10} {'total PSS':>10} {'p50 ms':>7}")
+    for r in results:
+        print(f"{r['mode']:>8} {r['worker_rss_mb']:>9.0f}MB {r['worker_pss_mb']:>9.0f}MB "
+              f"{r['total_rss_mb']:>8.0f}MB {r['total_pss_mb']:>8.0f}MB {r['p50_ms']:>7.2f}")
+    print("RSS counts shared pages in every process that maps them; PSS splits them, so total PSS is the real footprint")
+    with open(output, 'w') as f:
+        json.dump({'workers': workers, 'results': results}, f, indent=2)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve one memory-mapped copy of the weights to many forked workers")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    rep = subparsers.add_parser('report', help="Per-worker and total memory, private vs shared weights")
+    rep.add_argument('--workers', type=int, default=4)
+    rep.add_argument('--model', default=MODEL_PATH)
+    rep.add_argument('--runs', type=int, default=50)
+    rep.add_argument('-o', '--output', default='shared_memory.json')
+
+    export = subparsers.add_parser('export', help="Write the read-only TFLite weights file")
+    export.add_argument('--model', default=MODEL_PATH)
+    export.add_argument('--backend', default=SHARED_WEIGHTS_BACKEND, choices=list(TFLITE_PATHS))
+
+    args = parser.parse_args()
+    if args.command == 'report':
+        report(args.workers, args.model, args.runs, args.output)
+    else:
+        export_artifact(args.model, args.backend)
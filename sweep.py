@@ -0,0 +1,122 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmark import bench_batch_throughput, percentiles
+from constants import *
+
+def bench_single_image_latency(classifier, runs=50):
+    """predict_batch latency for one preprocessed image, the interactive case"""
+    image = np.random.default_rng(0).integers(0, 256, (1, *classifier.img_size, 3), dtype=np.uint8)
+    classifier.predict_batch(image)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        classifier.predict_batch(image)
+        timings.append((time.perf_counter() - start) * 1000)
+    return percentiles(timings)
+
+def build_candidate(candidate):
+    """CatDogClassifier with the candidate's backbone, width and input size, ready to train"""
+    from model import CatDogClassifier
+
+    classifier = CatDogClassifier()
+    classifier.base_model = candidate['base_model']
+    classifier.alpha = candidate.get('alpha', 1.0)
+    classifier.img_size = (candidate['img_size'], candidate['img_size'])
+    classifier.dense_units = candidate.get('dense_units', DENSE_UNITS)
+    classifier.dropout_rate = candidate.get('dropout_rate', DROPOUT_RATE)
+    classifier.create_model()
+    return classifier
+
+def run_candidate(candidate, train_dir, val_dir, epochs=SWEEP_EPOCHS, batch_size=32):
+    """Train one backbone configuration's head for a fixed number of epochs, then time it on CPU"""
+    from data_loader import DataLoader
+    from model import init_tensorflow
+
+    tf = init_tensorflow()
+    tf.keras.backend.clear_session()
+    classifier = build_candidate(candidate)
+
+    train_ds, val_ds = DataLoader().create_tf_datasets(train_dir, val_dir, batch_size=batch_size,
+                                                       img_size=classifier.img_size)
+    start = time.perf_counter()
+    classifier.model.fit(train_ds, epochs=epochs, validation_data=val_ds, verbose=2)
+    train_seconds = time.perf_counter() - start
+    _, accuracy = classifier.model.evaluate(val_ds, verbose=0)
+
+    return {
+        **candidate,
+        'name': f"{candidate['base_model']} a={classifier.alpha:g} {candidate['img_size']}px",
+        'params': int(classifier.model.count_params()),
+        'val_accuracy': float(accuracy),
+        'train_seconds': train_seconds,
+        'latency_1': bench_single_image_latency(classifier),
+        'throughput': bench_batch_throughput(classifier, [32], seconds=2.0)
+    }
+
+def plot_sweep(results, path='sweep.png', target=SWEEP_TARGET_ACCURACY):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    for r in results:
+        ax.scatter(r['latency_1']['p50_ms'], r['val_accuracy'], s=20 + r['params'] / 50_000)
+        ax.annotate(r['name'], (r['latency_1']['p50_ms'], r['val_accuracy']),
+                    textcoords='offset points', xytext=(5, 5), fontsize=8)
+    ax.axhline(target, color='gray', linestyle='--', label=f"target {target:.0%}")
+    ax.set_xlabel('CPU latency, 1 image, p50 (ms)')
+    ax.set_ylabel('Validation accuracy')
+    ax.set_title('Backbone sweep (marker size ~ parameters)')
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+def sweep(candidates=SWEEP_CANDIDATES, data_dir='data', epochs=SWEEP_EPOCHS, batch_size=32,
+          target=SWEEP_TARGET_ACCURACY, output='sweep.json', plot_path='sweep.png'):
+    """Train and time every candidate; report the fastest one that reaches `target` accuracy"""
+    results = []
+    for candidate in candidates:
+        print(f"\n▶️ {candidate}")
+        results.append(run_candidate(candidate, f"{data_dir}/train", f"{data_dir}/val", epochs, batch_size))
+        # Write after every candidate so a long sweep can be inspected early
+        with open(output, 'w') as f:
+            json.dump({'epochs': epochs, 'target': target, 'results': results}, f, indent=2)
+
+    plot_sweep(results, plot_path, target)
+    print(f"\n{'candidate':<32} {'params':>10} {'p50 ms':>8} {'img/s@32':>9} {'val acc':>8}")
+    for r in sorted(results, key=lambda r: r['latency_1']['p50_ms']):
+        print(f"{r['name']:<32} {r['params']:>10,} {r['latency_1']['p50_ms']:>8.2f} "
+              f"{r['throughput']['32']:>9.1f} {r['val_accuracy']:>8.1%}")
+
+    passing = [r for r in results if r['val_accuracy'] >= target]
+    best = min(passing, key=lambda r: r['latency_1']['p50_ms']) if passing else None
+    if best:
+        print(f"\n✅ Cheapest model at >= {target:.0%}: {best['name']}. In constants.py set\n"
+              f"   BASE_MODEL = '{best['base_model']}'\n   BACKBONE_ALPHA = {best.get('alpha', 1.0)}\n"
+              f"   IMG_SIZE = ({best['img_size']}, {best['img_size']})")
+    else:
+        print(f"\n⚠️ No candidate reached {target:.0%} in {epochs} epochs")
+    print(f"Results in {output}, plot in {plot_path}")
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train each backbone candidate briefly and plot CPU latency vs accuracy")
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--epochs', type=int, default=SWEEP_EPOCHS)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--target', type=float, default=SWEEP_TARGET_ACCURACY)
+    parser.add_argument('--candidates', help="JSON file with a list of candidates (default: SWEEP_CANDIDATES)")
+    parser.add_argument('-o', '--output', default='sweep.json')
+    parser.add_argument('--plot', default='sweep.png')
+    args = parser.parse_args()
+
+    candidates = SWEEP_CANDIDATES
+    if args.candidates:
+        with open(args.candidates) as f:
+            candidates = json.load(f)
+    sweep(candidates, args.data_dir, args.epochs, args.batch_size, args.target, args.output, args.plot)
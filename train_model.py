@@ -1,11 +1,23 @@
+import argparse
+import contextlib
 import tensorflow as tf
 from model import CatDogClassifier
 from data_loader import DataLoader
+from autotune import apply_tuning
+from training_state import ResumableCheckpoint, TrainingState
+from distributed import is_chief
 from constants import *
 import matplotlib.pyplot as plt
 
-def train_high_accuracy_model():
-    """Train model with 90%+ accuracy using massive dataset"""
+def train_high_accuracy_model(resume=False, profile_steps=None, distributed=False):
+    """Train model with 90%+ accuracy using massive dataset
+    
+    With resume=True, continue from the latest snapshot in CHECKPOINT_DIR,
+    skipping the frozen-base phase if it already finished. profile_steps=(start, stop)
+    records a TensorFlow profiler trace of those training steps to PROFILE_LOG_DIR.
+    distributed=True trains data-parallel under MultiWorkerMirroredStrategy
+    across the workers listed in TF_CONFIG (see distributed.py).
+    """
     
     # Initialize components
     classifier = CatDogClassifier()
@@ -16,16 +28,39 @@ def train_high_accuracy_model():
     
     print("Setting up training environment...")
     
+    # Machine-specific settings from autotune.py, if it has been run
+    batch_size = apply_tuning(classifier)
+    classifier.set_execution_mode(EXECUTION_MODE)
+    
+    strategy, chief = None, True
+    if distributed:
+        from distributed import cluster_info, distributed_datasets, get_strategy, write_path
+        strategy = get_strategy()
+        rank, workers = cluster_info()
+        chief = rank == 0
+        # Linear scaling rule: the global batch is `workers` times larger
+        classifier.learning_rate = LEARNING_RATE * workers
+        print(f"Worker {rank} of {workers}, global batch {batch_size * workers}, "
+              f"learning rate {classifier.learning_rate:g}")
+    scope = strategy.scope if strategy else contextlib.nullcontext
+    
     # Create model
-    classifier.create_model()
+    with scope():
+        classifier.create_model()
     
     # Print model summary
     classifier.model.summary()
     
     # Create data generators with massive augmentation
-    train_gen, val_gen = data_loader.create_data_generators(
-        dirs['train'], dirs['val']
-    )
+    if strategy:
+        train_gen, val_gen, steps_per_epoch, validation_steps = distributed_datasets(
+            strategy, data_loader, dirs['train'], dirs['val'], batch_size
+        )
+    else:
+        train_gen, val_gen = data_loader.create_input_pipeline(
+            dirs['train'], dirs['val'], batch_size=batch_size
+        )
+        steps_per_epoch = validation_steps = None
     
     # Enhanced callbacks for high accuracy
     callbacks = [
@@ -49,46 +84,106 @@ def train_high_accuracy_model():
         )
     ]
     
+    if profile_steps:
+        # Opt-in: traces only the given window of batches, in each phase
+        callbacks.append(tf.keras.callbacks.TensorBoard(
+            log_dir=PROFILE_LOG_DIR,
+            profile_batch=tuple(profile_steps),
+            write_graph=False,
+            update_freq='epoch'
+        ))
+    
+    # Full-state snapshots so an interrupted run can continue with --resume
+    state = TrainingState(chief=chief)
+    resume_state = state.latest() if resume else None
+    if resume and resume_state is None:
+        print("No training snapshot found, starting from scratch")
+    if resume_state is None:
+        state.clear()
+    histories = resume_state['history'] if resume_state else {}
+    phase = resume_state['phase'] if resume_state else 'head'
+    initial_epoch = resume_state['epoch'] if resume_state else 0
+    
     print("Starting training for 90%+ accuracy...")
     
-    # Train model
-    history = classifier.model.fit(
-        train_gen,
-        epochs=EPOCHS,
-        validation_data=val_gen,
-        callbacks=callbacks,
-        verbose=1
-    )
+    if phase != 'head':
+        print("Frozen-base phase already complete, continuing with fine-tuning")
+    elif USE_FEATURE_CACHE and not strategy:
+        # Phase 1 on cached embeddings: the frozen backbone runs once, not every epoch
+        from feature_cache import load_features
+        train_x, train_y, val_x, val_y = load_features(classifier, dirs['train'], dirs['val'])
+        checkpoint = ResumableCheckpoint(state, classifier.model, 'head', callbacks[:2], resume_state, histories)
+        classifier.train_head(
+            train_x, train_y, val_x, val_y,
+            epochs=EPOCHS,
+            batch_size=batch_size,
+            # checkpointing the head alone would overwrite MODEL_PATH
+            callbacks=callbacks[:2] + [checkpoint],
+            initial_epoch=initial_epoch
+        )
+    else:
+        # Train model
+        checkpoint = ResumableCheckpoint(state, classifier.model, 'head', callbacks, resume_state, histories)
+        classifier.model.fit(
+            train_gen,
+            epochs=EPOCHS,
+            validation_data=val_gen,
+            callbacks=callbacks + [checkpoint],
+            verbose=1,
+            initial_epoch=initial_epoch,
+            steps_per_epoch=steps_per_epoch,
+            validation_steps=validation_steps
+        )
+    
+    if phase == 'head':
+        # Phase boundary: fresh optimizer, but ModelCheckpoint keeps its best score
+        # across phases, so only its state is carried over
+        state.save(classifier.model, 'fine_tune', 0,
+                   callbacks=[c if isinstance(c, tf.keras.callbacks.ModelCheckpoint) else None for c in callbacks],
+                   histories=histories)
+        resume_state, initial_epoch = None, 0
+    
+    # History across resumes, not only the epochs run by this process
+    history = tf.keras.callbacks.History()
+    history.history = histories.get('head', {})
     
     # Fine-tuning for higher accuracy
     print("Fine-tuning for maximum accuracy...")
     
     # Unfreeze top layers
-    classifier.model.layers[0].trainable = True
-    for layer in classifier.model.layers[0].layers[:-FINE_TUNE_LAYERS]:
+    backbone = classifier.backbone()
+    backbone.trainable = True
+    for layer in backbone.layers[:-FINE_TUNE_LAYERS]:
         layer.trainable = False
     
     # Recompile with lower learning rate
-    classifier.model.compile(
-        optimizer=tf.keras.optimizers.Adam(LEARNING_RATE/10),
-        loss='categorical_crossentropy',
-        metrics=['accuracy']
-    )
+    with scope():
+        classifier.model.compile(
+            optimizer=tf.keras.optimizers.Adam(classifier.learning_rate/10),
+            loss='categorical_crossentropy',
+            metrics=['accuracy'],
+            steps_per_execution=classifier.steps_per_execution,
+            jit_compile=classifier.jit_compile
+        )
     
     # Continue training
+    checkpoint = ResumableCheckpoint(state, classifier.model, 'fine_tune', callbacks, resume_state, histories)
     history_fine = classifier.model.fit(
         train_gen,
         epochs=5,
         validation_data=val_gen,
-        callbacks=callbacks,
-        verbose=1
+        callbacks=callbacks + [checkpoint],
+        verbose=1,
+        initial_epoch=initial_epoch,
+        steps_per_epoch=steps_per_epoch,
+        validation_steps=validation_steps
     )
     
-    # Save final model
-    classifier.save_model(MODEL_PATH)
+    # Save final model (every worker saves, only the chief's copy is kept)
+    classifier.save_model(write_path(MODEL_PATH) if strategy else MODEL_PATH)
     
     # Evaluate final accuracy
-    val_loss, val_accuracy = classifier.model.evaluate(val_gen)
+    val_loss, val_accuracy = classifier.model.evaluate(val_gen, steps=validation_steps)
     print(f"Final Validation Accuracy: {val_accuracy:.4f}")
     
     if val_accuracy >= 0.90:
@@ -121,5 +216,14 @@ def plot_training_history(history):
     plt.show()
 
 if __name__ == "__main__":
-    classifier, history = train_high_accuracy_model()
-    plot_training_history(history)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Two-phase training of the cat/dog/other classifier")
+    parser.add_argument('--resume', action='store_true', help=f"Continue from the latest snapshot in {CHECKPOINT_DIR}")
+    parser.add_argument('--profile-steps', type=int, nargs=2, metavar=('START', 'STOP'),
+                        help=f"Write a TensorFlow profiler trace of these training steps to {PROFILE_LOG_DIR}")
+    parser.add_argument('--distributed', action='store_true',
+                        help="Multi-worker data-parallel training over the cluster in TF_CONFIG")
+    args = parser.parse_args()
+    classifier, history = train_high_accuracy_model(resume=args.resume, profile_steps=args.profile_steps,
+                                                    distributed=args.distributed)
+    if is_chief():
+        plot_training_history(history)
\ No newline at end of file
@@ -0,0 +1,176 @@
+import json
+import os
+import pickle
+import random
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+
+from constants import *
+
+# Callback attributes that carry progress across epochs (EarlyStopping,
+# ReduceLROnPlateau, ModelCheckpoint); Keras resets them in on_train_begin
+CALLBACK_STATE_ATTRS = ('wait', 'best', 'best_epoch', 'cooldown_counter', 'stopped_epoch')
+
+def _write_json(path, data):
+    """Write JSON to a temporary file, fsync it, then rename it over `path`"""
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def _to_builtin(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+class TrainingState:
+    """Full-state training snapshots: weights, optimizer slots, epoch, phase, callback and RNG state.
+
+    Each snapshot is written to a temporary directory and renamed into place;
+    `latest.json` is then atomically switched to it, so a crash at any point
+    leaves the previous snapshot intact.
+    """
+    def __init__(self, directory=CHECKPOINT_DIR, keep=2, chief=True):
+        self.directory = Path(directory)
+        self.keep = keep
+        # Non-chief workers in multi-worker training read snapshots but never write them
+        self.chief = chief
+
+    def latest(self):
+        """Metadata of the newest complete snapshot, or None"""
+        pointer = self.directory / 'latest.json'
+        if not pointer.exists():
+            return None
+        with open(pointer) as f:
+            name = json.load(f)['snapshot']
+        with open(self.directory / name / 'state.json') as f:
+            state = json.load(f)
+        state['path'] = str(self.directory / name)
+        return state
+
+    def clear(self):
+        if self.chief:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def save(self, model, phase, epoch, optimizer=None, callbacks=(), histories=None):
+        """Snapshot the run; `epoch` is the number of epochs of `phase` already completed"""
+        tracked = {'model': model}
+        if optimizer is not None:
+            tracked['optimizer'] = optimizer
+        if not self.chief:
+            # Saving may aggregate variables across workers, so every worker
+            # takes part, but only the chief's snapshot is kept
+            scratch = tempfile.mkdtemp()
+            tf.train.Checkpoint(**tracked).write(os.path.join(scratch, 'weights'))
+            shutil.rmtree(scratch, ignore_errors=True)
+            return
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"{phase}-{epoch:04d}"
+        tmp = self.directory / f"{name}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        tf.train.Checkpoint(**tracked).write(str(tmp / 'weights'))
+
+        callback_state = []
+        for callback in callbacks:
+            # None entries keep list positions for callbacks that should not be restored
+            attrs = {attr: _to_builtin(getattr(callback, attr)) for attr in CALLBACK_STATE_ATTRS
+                     if hasattr(callback, attr)}
+            callback_state.append({'class': type(callback).__name__, 'attrs': attrs})
+            best_weights = getattr(callback, 'best_weights', None)
+            if best_weights is not None:
+                np.savez(tmp / f"best_weights_{len(callback_state) - 1}.npz", *best_weights)
+
+        with open(tmp / 'rng.pkl', 'wb') as f:
+            pickle.dump({
+                'python': random.getstate(),
+                'numpy': np.random.get_state(),
+                'tensorflow': tf.random.get_global_generator().state.numpy()
+            }, f)
+
+        _write_json(tmp / 'state.json', {
+            'phase': phase,
+            'epoch': epoch,
+            'has_optimizer': optimizer is not None,
+            'learning_rate': float(tf.keras.backend.get_value(optimizer.learning_rate)) if optimizer else None,
+            'callbacks': callback_state,
+            'history': histories or {}
+        })
+
+        shutil.rmtree(self.directory / name, ignore_errors=True)
+        os.replace(tmp, self.directory / name)
+        _write_json(self.directory / 'latest.json', {'snapshot': name})
+        self._prune(name)
+
+    def _prune(self, current):
+        snapshots = sorted((p for p in self.directory.iterdir() if p.is_dir() and not p.name.endswith('.tmp')),
+                           key=lambda p: p.stat().st_mtime)
+        for path in snapshots[:-self.keep]:
+            if path.name != current:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def restore(self, state, model, optimizer=None, callbacks=()):
+        """Load a snapshot returned by latest() into a model built the same way"""
+        path = Path(state['path'])
+        tracked = {'model': model}
+        if optimizer is not None and state['has_optimizer']:
+            # Create slot variables up front so they are restored immediately
+            if hasattr(optimizer, 'build'):
+                optimizer.build(model.trainable_variables)
+            tracked['optimizer'] = optimizer
+        tf.train.Checkpoint(**tracked).read(str(path / 'weights')).expect_partial()
+        if optimizer is not None and state['learning_rate'] is not None:
+            tf.keras.backend.set_value(optimizer.learning_rate, state['learning_rate'])
+
+        for index, (callback, saved) in enumerate(zip(callbacks, state['callbacks'])):
+            if type(callback).__name__ != saved['class']:
+                continue
+            for attr, value in saved['attrs'].items():
+                setattr(callback, attr, value)
+            best_file = path / f"best_weights_{index}.npz"
+            if best_file.exists():
+                with np.load(best_file) as arrays:
+                    callback.best_weights = [arrays[f"arr_{i}"] for i in range(len(arrays.files))]
+
+        with open(path / 'rng.pkl', 'rb') as f:
+            rng = pickle.load(f)
+        random.setstate(rng['python'])
+        np.random.set_state(rng['numpy'])
+        tf.random.get_global_generator().reset(rng['tensorflow'])
+
+class ResumableCheckpoint(tf.keras.callbacks.Callback):
+    """Writes a TrainingState snapshot every `every` epochs and restores one when training starts.
+
+    Place it after the callbacks it snapshots so their own on_train_begin
+    resets happen before the saved state is put back.
+    """
+    def __init__(self, state, full_model, phase, callbacks=(), resume=None, histories=None,
+                 every=CHECKPOINT_EVERY_EPOCHS):
+        super().__init__()
+        self.state = state
+        self.full_model = full_model
+        self.phase = phase
+        self.tracked_callbacks = list(callbacks)
+        self.resume = resume if resume and resume['phase'] == phase else None
+        self.every = every
+        # Per-phase epoch logs, shared with the caller and saved in every snapshot
+        self.histories = histories if histories is not None else {}
+        self.history = self.histories.setdefault(phase, {})
+
+    def on_train_begin(self, logs=None):
+        if self.resume:
+            print(f"↩️ Resuming {self.phase} from epoch {self.resume['epoch']}")
+            self.state.restore(self.resume, self.full_model, self.model.optimizer, self.tracked_callbacks)
+            self.resume = None
+
+    def on_epoch_end(self, epoch, logs=None):
+        for key, value in (logs or {}).items():
+            self.history.setdefault(key, []).append(float(value))
+        if (epoch + 1) % self.every == 0:
+            self.state.save(self.full_model, self.phase, epoch + 1, self.model.optimizer,
+                            self.tracked_callbacks, self.histories)
@@ -0,0 +1,167 @@
+import argparse
+import json
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from constants import *
+from metrics import METRICS
+
+# Scene-change comparison runs on small grayscale thumbnails
+_THUMBNAIL_SIZE = (32, 32)
+
+def _frames(path, size, sample_fps, scene_threshold, frames, stop):
+    """Decode thread: put (timestamp, uint8 frame or None) on `frames`, then a final None.
+
+    Frames between samples are only grabbed, never converted. A sampled frame
+    whose thumbnail differs from the last kept one by less than
+    `scene_threshold` (mean absolute difference, 0-255) is put as None: it
+    reuses the previous prediction instead of running the model.
+    """
+    capture = cv2.VideoCapture(path)
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        step = max(fps / sample_fps, 1.0) if sample_fps else 1.0
+        index, next_sample, last_thumbnail = 0, 0.0, None
+        while not stop.is_set():
+            with METRICS.time('video_decode'):
+                if not capture.grab():
+                    break
+                sampled = index >= next_sample
+                if sampled:
+                    next_sample += step
+                    ok, frame = capture.retrieve()
+            index += 1
+            if not sampled or not ok:
+                continue
+
+            timestamp = (index - 1) / fps
+            if scene_threshold:
+                thumbnail = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), _THUMBNAIL_SIZE,
+                                       interpolation=cv2.INTER_AREA).astype(np.int16)
+                if last_thumbnail is not None and np.abs(thumbnail - last_thumbnail).mean() < scene_threshold:
+                    frames.put((timestamp, None))
+                    continue
+                last_thumbnail = thumbnail
+            with METRICS.time('preprocess'):
+                frame = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), tuple(size), interpolation=cv2.INTER_AREA)
+            frames.put((timestamp, frame))
+    finally:
+        capture.release()
+        frames.put(None)
+
+def aggregate(timestamps, probabilities, classes, segment_seconds=VIDEO_SEGMENT_SECONDS):
+    """Per-segment and whole-clip labels from the mean class probabilities of their frames"""
+    def summarize(probs):
+        mean = probs.mean(axis=0)
+        return {'label': classes[int(np.argmax(mean))], 'confidence': float(np.max(mean)),
+                'probabilities': {name: float(p) for name, p in zip(classes, mean)}}
+
+    segments = []
+    segment_ids = (timestamps // segment_seconds).astype(int)
+    for segment in np.unique(segment_ids):
+        mask = segment_ids == segment
+        segments.append({'start_s': float(segment * segment_seconds),
+                         'end_s': float((segment + 1) * segment_seconds),
+                         'frames': int(mask.sum()), **summarize(probabilities[mask])})
+    return summarize(probabilities), segments
+
+def classify_video(classifier, path, sample_fps=VIDEO_SAMPLE_FPS, scene_threshold=VIDEO_SCENE_THRESHOLD,
+                   batch_size=VIDEO_BATCH_SIZE, segment_seconds=VIDEO_SEGMENT_SECONDS):
+    """Classify a video file: sampled frames go through the model in batches while the next ones decode.
+
+    Returns the whole-clip label, per-segment labels and frame counts, plus
+    throughput in frames per second (sampled frames over wall time).
+    """
+    frames = queue.Queue(maxsize=4 * batch_size)  # Bounded, so decoding never runs far ahead
+    stop = threading.Event()
+    decoder = threading.Thread(target=_frames, args=(path, classifier.img_size, sample_fps, scene_threshold,
+                                                      frames, stop), daemon=True)
+    start = time.perf_counter()
+    decoder.start()
+
+    # Every sampled frame as (timestamp, index of the kept frame whose prediction it uses)
+    sampled, batch, kept = [], [], []
+    skipped = 0
+
+    def flush():
+        if batch:
+            kept.extend(classifier.predict_batch(np.stack(batch)))
+            batch.clear()
+
+    try:
+        while (item := frames.get()) is not None:
+            timestamp, frame = item
+            if frame is None:
+                # A near-duplicate of the last kept frame, which may still be waiting in `batch`
+                skipped += 1
+                sampled.append((timestamp, len(kept) + len(batch) - 1))
+                continue
+            sampled.append((timestamp, len(kept) + len(batch)))
+            batch.append(frame)
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+    finally:
+        stop.set()
+        # Unblock the decoder if it is waiting on a full queue
+        while decoder.is_alive():
+            try:
+                frames.get(timeout=0.1)
+            except queue.Empty:
+                pass
+    elapsed = time.perf_counter() - start
+    if not kept:
+        raise ValueError(f"No frames could be decoded from {path}")
+
+    timestamps = np.array([timestamp for timestamp, _ in sampled])
+    probabilities = np.stack(kept)[[source for _, source in sampled]]
+    clip, segments = aggregate(timestamps, probabilities, classifier.classes, segment_seconds)
+    return {
+        'path': str(path),
+        **clip,
+        'segments': segments,
+        'frames_sampled': len(sampled),
+        'frames_classified': len(kept),
+        'frames_skipped': skipped,
+        'seconds': elapsed,
+        'sampled_fps': len(sampled) / elapsed,
+        'classified_fps': len(kept) / elapsed
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classify pets in video files from sampled, batched frames")
+    parser.add_argument('videos', nargs='+')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--backend', default=INFERENCE_BACKEND, choices=['keras', 'savedmodel', *TFLITE_PATHS])
+    parser.add_argument('--sample-fps', type=float, default=VIDEO_SAMPLE_FPS, help="0 classifies every frame")
+    parser.add_argument('--scene-threshold', type=float, default=VIDEO_SCENE_THRESHOLD,
+                        help="Skip frames closer than this to the last classified one (0 disables)")
+    parser.add_argument('--batch-size', type=int, default=VIDEO_BATCH_SIZE)
+    parser.add_argument('--segment-seconds', type=float, default=VIDEO_SEGMENT_SECONDS)
+    parser.add_argument('-o', '--output', help="Write all results as JSON")
+    args = parser.parse_args()
+
+    from model import CatDogClassifier
+    classifier = CatDogClassifier()
+    classifier.load_model(args.model, backend=args.backend, fallback=False)
+    classifier.warm_up()
+
+    results = []
+    for path in args.videos:
+        result = classify_video(classifier, path, args.sample_fps, args.scene_threshold,
+                                args.batch_size, args.segment_seconds)
+        results.append(result)
+        print(f"\n🎬 {path}: {result['label'].upper()} ({result['confidence']:.1%})")
+        for segment in result['segments']:
+            print(f"  {segment['start_s']:7.1f}-{segment['end_s']:7.1f}s  {segment['label']:<6} "
+                  f"{segment['confidence']:.1%}  ({segment['frames']} frames)")
+        print(f"  {result['frames_sampled']} frames sampled, {result['frames_classified']} classified, "
+              f"{result['frames_skipped']} skipped as near-duplicates; "
+              f"{result['sampled_fps']:.1f} fps sampled, {result['classified_fps']:.1f} fps through the model")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)